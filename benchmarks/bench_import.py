@@ -0,0 +1,89 @@
+"""
+Times importing fillpdf and starting its command lines in fresh interpreters,
+and checks that the heavy backends (fitz, Pillow, pdf2image, pdfrw, asyncio, sqlite3)
+are only imported by the functions that use them. Exits with 1 when a
+backend is imported up front, a pdfrw fill or extraction imports PyMuPDF,
+Pillow or pdf2image, or an import is slower than --max-ms. Works from any
+directory.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 20 --max-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['fitz', 'pymupdf', 'PIL', 'pdf2image', 'pdfrw', 'asyncio', 'multiprocessing', 'sqlite3', 'importlib.metadata']
+
+# The commands run from the repository root, where the sample pdfs are
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTS = {
+    'import fillpdf.fillpdfs': 'import fillpdf.fillpdfs',
+    'get_form_fields (pdfrw only)': "from fillpdf import fillpdfs; fillpdfs.get_form_fields('new.pdf')",
+    'write_fillable_pdf (pdfrw only)': "from fillpdf import fillpdfs; "
+                                       "fillpdfs.write_fillable_pdf('new.pdf', None, {'Given Name Text Box': 'John'})",
+}
+# Backends these statements must not import, on top of the ones they need
+PDFRW_ONLY = ['fitz', 'pymupdf', 'PIL', 'pdf2image']
+COMMANDS = {
+    'extractfillpdf --version': ['-m', 'fillpdf.extractfillpdf', '--version'],
+}
+
+
+def loaded_backends(statement):
+    """
+    Returns the heavy modules imported after running statement.
+    """
+    check = f"{statement}; import sys; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return output.split()
+
+
+def time_process(arguments, repeat):
+    """
+    Returns the median wall time in seconds of running the interpreter with
+    arguments, startup included.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=ROOT)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the import time of fillpdf")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="fail when importing fillpdf.fillpdfs takes longer, interpreter startup excluded")
+    args = parser.parse_args(argv)
+
+    baseline = time_process(['-c', 'pass'], args.repeat)
+    print(f"{'interpreter startup':32s} {baseline * 1000:8.1f} ms")
+    failed = False
+    for name, statement in IMPORTS.items():
+        seconds = time_process(['-c', statement], args.repeat) - baseline
+        backends = loaded_backends(statement)
+        print(f"{name:32s} {seconds * 1000:8.1f} ms  {' '.join(backends) or '-'}")
+        if name == 'import fillpdf.fillpdfs':
+            if backends:
+                print("  backends imported up front: " + ' '.join(backends))
+                failed = True
+            if args.max_ms is not None and seconds * 1000 > args.max_ms:
+                print(f"  slower than {args.max_ms:g} ms")
+                failed = True
+        elif any(module in backends for module in PDFRW_ONLY):
+            print("  pdfrw only, but imported: " + ' '.join(m for m in PDFRW_ONLY if m in backends))
+            failed = True
+    for name, arguments in COMMANDS.items():
+        seconds = time_process(arguments, args.repeat) - baseline
+        print(f"{name:32s} {seconds * 1000:8.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
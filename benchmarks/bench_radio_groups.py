@@ -0,0 +1,68 @@
+"""
+Times write_fillable_pdf() on generated forms with a growing number of radio
+groups. The fill time should grow linearly with the number of groups.
+
+    python benchmarks/bench_radio_groups.py 50 100 200 400
+"""
+import io
+import os
+import sys
+import time
+
+import pdfrw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fillpdf import fillpdfs
+
+
+def make_radio_form(groups, kids=3, fields=100):
+    """
+    Builds a one page pdf with the given number of radio groups, each with
+    kids buttons exporting '0', '1', ..., plus some text fields.
+    """
+    appearance = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.XObject, Subtype=pdfrw.PdfName.Form,
+                                       BBox=pdfrw.PdfArray([0, 0, 10, 10]))
+    appearance.stream = ''
+    page = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Page, MediaBox=pdfrw.PdfArray([0, 0, 612, 792]),
+                                 Annots=pdfrw.PdfArray())
+    acroform_fields = pdfrw.PdfArray()
+    for group in range(groups):
+        parent = pdfrw.IndirectPdfDict(FT=pdfrw.PdfName.Btn, Ff=49152, T=pdfrw.PdfString.encode(f'Radio{group}'),
+                                       Kids=pdfrw.PdfArray())
+        for kid in range(kids):
+            widget = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Annot, Subtype=pdfrw.PdfName.Widget, Parent=parent,
+                                           Rect=pdfrw.PdfArray([kid * 12, group, kid * 12 + 10, group + 10]),
+                                           AS=pdfrw.PdfName.Off,
+                                           AP=pdfrw.PdfDict(N=pdfrw.PdfDict({pdfrw.PdfName(str(kid)): appearance,
+                                                                             pdfrw.PdfName.Off: appearance})))
+            parent.Kids.append(widget)
+            page.Annots.append(widget)
+        acroform_fields.append(parent)
+    for field in range(fields):
+        widget = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Annot, Subtype=pdfrw.PdfName.Widget, FT=pdfrw.PdfName.Tx,
+                                       T=pdfrw.PdfString.encode(f'Text{field}'), Rect=pdfrw.PdfArray([0, 0, 10, 10]))
+        page.Annots.append(widget)
+        acroform_fields.append(widget)
+    writer = pdfrw.PdfWriter()
+    writer.addpage(page)
+    writer.trailer.Root.AcroForm = pdfrw.IndirectPdfDict(Fields=acroform_fields)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def main(group_counts):
+    for groups in group_counts:
+        form = make_radio_form(groups)
+        data_dict = {f'Radio{group}': str(group % 3) for group in range(groups)}
+        data_dict.update({f'Text{field}': 'x' for field in range(100)})
+        start = time.perf_counter()
+        fillpdfs.write_fillable_pdf(form, None, data_dict)
+        elapsed = time.perf_counter() - start
+        print(f"{groups:6d} radio groups  {elapsed * 1000:9.1f} ms  {elapsed / groups * 1e6:8.1f} us/group")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [50, 100, 200, 400])
@@ -0,0 +1,218 @@
+"""
+Benchmark suite for fillpdf. Generates a synthetic form with the place_*
+helpers, then times get_form_fields(), write_fillable_pdf(), flatten_pdf()
+in each mode and the extractfillpdf and insertfillpdf command lines. Every
+case runs in its own process, so its peak memory is measured on its own.
+Results are compared with a stored baseline and the script exits with 1
+when a case got slower or bigger than the tolerance allows.
+
+    python benchmarks/bench_suite.py --save-baseline    # store a baseline
+    python benchmarks/bench_suite.py                    # compare with it
+    python benchmarks/bench_suite.py --pages 20 --fields 50 --radio-groups 10
+
+Baselines depend on the machine, store one before making changes and compare
+on the same machine.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fillpdf import fillpdfs
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DROPDOWN_VALUES = ('Austria', 'Belgium', 'Britain', 'Denmark')
+
+
+def make_form(pages, fields, radio_groups, radio_buttons=3):
+    """
+    Builds a pdf with the given number of pages, each with fields fields
+    (every fourth one a dropdown, the others text boxes), plus radio_groups
+    groups of radio_buttons buttons spread over the pages.
+    Returns
+    ---------
+    form: bytes
+        The pdf.
+    record: dict
+        A data_dict filling every field of the form.
+    """
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    record = {}
+    with fillpdfs.PdfEditor(doc.tobytes()) as editor:
+        for page_number in range(1, pages + 1):
+            for field in range(fields):
+                x, y = 40 + (field % 3) * 180, 40 + (field // 3) * 24 % 700
+                name = f'Field{page_number}_{field}'
+                if field % 4 == 3:
+                    editor.place_dropdown(name, DROPDOWN_VALUES, x, y, page_number, width=150, height=18, font_size=10)
+                    record[name] = DROPDOWN_VALUES[field % len(DROPDOWN_VALUES)]
+                else:
+                    editor.place_text_box(name, '', x, y, page_number, width=150, height=18, font_size=10)
+                    record[name] = f'Value {page_number} {field}'
+        for group in range(radio_groups):
+            page_number = group % pages + 1
+            for button in range(radio_buttons):
+                editor.place_radiobutton(f'Radio{group}', 40 + button * 20, 760 - (group // pages) * 14 % 60, page_number)
+            record[f'Radio{group}'] = 'Yes'
+    return editor.result, record
+
+
+def _cli(module, *args):
+    subprocess.run([sys.executable, '-m', module] + list(args), check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+
+
+def _case(name, form_path, record_path, work_dir):
+    """
+    Returns the callable timed for a case.
+    """
+    with open(record_path) as record_file:
+        record = json.load(record_file)
+    output_path = os.path.join(work_dir, name + '.pdf')
+    if name == 'get_form_fields':
+        return lambda: fillpdfs.get_form_fields(form_path)
+    if name == 'write_fillable_pdf':
+        return lambda: fillpdfs.write_fillable_pdf(form_path, output_path, record)
+    if name == 'FormTemplate.write':
+        template = fillpdfs.FormTemplate(form_path)
+        return lambda: template.write(output_path, record)
+    if name == 'flatten_pdf':
+        return lambda: fillpdfs.flatten_pdf(form_path, output_path)
+    if name == 'flatten_pdf_as_vector':
+        return lambda: fillpdfs.flatten_pdf(form_path, output_path, as_vector=True)
+    if name == 'flatten_pdf_as_images':
+        return lambda: fillpdfs.flatten_pdf(form_path, output_path, as_images=True, dpi=72)
+    if name == 'extractfillpdf':
+        return lambda: _cli('fillpdf.extractfillpdf', form_path, '-o', os.path.join(work_dir, 'extract.json'))
+    if name == 'insertfillpdf':
+        return lambda: _cli('fillpdf.insertfillpdf', form_path, '-j', record_path, '-o', output_path)
+    raise KeyError(name)
+
+
+CASES = ['get_form_fields', 'write_fillable_pdf', 'FormTemplate.write', 'flatten_pdf', 'flatten_pdf_as_vector',
+         'flatten_pdf_as_images', 'extractfillpdf', 'insertfillpdf']
+
+
+def run_case(name, form_path, record_path, work_dir, repeat):
+    """
+    Runs one case repeat times in the current process, meant to be called in
+    a fresh worker process.
+    Returns
+    ---------
+    A dict with the median and best time in seconds and the peak resident
+    memory in MB, including command line processes, or with the reason the
+    case was skipped when it can't run here (e.g. poppler missing for
+    flatten_pdf_as_images).
+    """
+    function = _case(name, form_path, record_path, work_dir)
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    except Exception as error:
+        return dict(skipped=f'{type(error).__name__}: {error}')
+    peak_mb = None
+    if resource is not None:
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_mb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / scale
+    return dict(seconds=statistics.median(timings), best=min(timings), peak_mb=peak_mb)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the messages for every case that got slower or used more memory
+    than the baseline by more than tolerance.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or 'seconds' not in before or 'seconds' not in result:
+            continue
+        if result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['seconds'] * 1000:.1f} ms, baseline {before['seconds'] * 1000:.1f} ms")
+        if result['peak_mb'] and before.get('peak_mb') and result['peak_mb'] > before['peak_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['peak_mb']:.1f} MB, baseline {before['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark fillpdf on a synthetic form")
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--fields', type=int, default=40, help="fields per page")
+    parser.add_argument('--radio-groups', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown before a case is a regression, 0.25 is 25%%")
+    args = parser.parse_args(argv)
+
+    config = dict(pages=args.pages, fields=args.fields, radio_groups=args.radio_groups)
+    field_count = args.pages * args.fields + args.radio_groups
+    with tempfile.TemporaryDirectory() as work_dir:
+        form, record = make_form(args.pages, args.fields, args.radio_groups)
+        form_path = os.path.join(work_dir, 'form.pdf')
+        record_path = os.path.join(work_dir, 'form.json')
+        with open(form_path, 'wb') as form_file:
+            form_file.write(form)
+        with open(record_path, 'w') as record_file:
+            json.dump(record, record_file)
+
+        results = {}
+        print(f"{args.pages} pages, {field_count} fields, {len(form) / 1024:.0f} KB")
+        print(f"{'case':24s} {'median ms':>10s} {'best ms':>10s} {'fields/s':>10s} {'pages/s':>9s} {'peak MB':>8s}")
+        for name in args.cases:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_case, name, form_path, record_path, work_dir, args.repeat).result()
+            results[name] = result
+            if 'skipped' in result:
+                print(f"{name:24s} skipped ({result['skipped']})")
+                continue
+            peak = f"{result['peak_mb']:8.1f}" if result['peak_mb'] else f"{'-':>8s}"
+            print(f"{name:24s} {result['seconds'] * 1000:10.1f} {result['best'] * 1000:10.1f} "
+                  f"{field_count / result['seconds']:10.0f} {args.pages / result['seconds']:9.1f} {peak}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(dict(config=config, results=results), baseline_file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with, run with --save-baseline first")
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline['config'] != config:
+        print(f"Baseline was made with {baseline['config']}, not comparing")
+        return 0
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -10,12 +10,18 @@ References:
 """
 
 import argparse
+import contextlib
+import csv
+import glob
+import itertools
 import json
 import logging
+import os
 import sys
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
-from fillpdf import fillpdfs,  __version__
+from fillpdf import fillpdfs
+from fillpdf.utils.cli import VersionAction
 
 _logger = logging.getLogger(__name__)
 
@@ -24,16 +30,43 @@ _logger = logging.getLogger(__name__)
 # The functions defined in this section can be imported by users in their
 # Python scripts/interactive interpreter
 
-def extractfillpdf(input_file: str, output_file: str) -> int:
+def extractfillpdf(
+    input_file: Union[str, Iterable[str]],
+    output_file: str,
+    output_format: Optional[str] = None,
+    workers: int = 1,
+    index_file: Optional[str] = None,
+) -> int:
     """ "Extract data an store it in json format
 
+    A single PDF file is written as one JSON object. Directories, glob patterns
+    and lists of files are read on a pool of worker processes and streamed to
+    a JSON Lines or CSV file with one row per PDF, see
+    :func:`extractfillpdf_rows`, and so is a single file read with an index.
+
     Args:
-        input_file (str): Input PDF file
-        output_file (str): Output JSON file
+        input_file (str): Input PDF file, directory or glob pattern, or a list
+                          of them
+        output_file (str): Output JSON, JSON Lines or CSV file, ``-`` writes
+                           JSON Lines to stdout
+        output_format (str): ``jsonl`` or ``csv`` to write one row per PDF, if
+                             none given, it is taken from the extension
+        workers (int): number of worker processes
+        index_file (str): SQLite extraction index, only new and changed PDFs
+                          are parsed. Writes one row per PDF, also for a
+                          single file
 
     Returns:
-        int: number of records
+        int: number of records, or of PDFs read when several are extracted
     """
+    if output_format is None and (output_file == "-" or output_file.lower().endswith((".jsonl", ".csv"))):
+        output_format = "csv" if output_file.lower().endswith(".csv") else "jsonl"
+    # a path that does not exist is read as a single PDF, so a typo raises
+    if _names_many(input_file) or index_file is not None or (
+        output_format is not None and os.path.isfile(input_file)
+    ):
+        inputs = [input_file] if isinstance(input_file, str) else input_file
+        return extractfillpdf_rows(find_pdfs(inputs), output_file, output_format or "jsonl", workers, index_file)
 
     # read PDF file with fillpdf.get_form_fields
     dict_data = fillpdfs.get_form_fields(input_file)
@@ -51,6 +84,198 @@ def extractfillpdf(input_file: str, output_file: str) -> int:
     return len(dict_data)
 
 
+def _walk_pdfs(directory: str) -> Iterator[str]:
+    """Yield the PDF files below a directory, one directory listing at a time"""
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = sorted(os.scandir(current), key=lambda entry: entry.name)
+        except OSError as error:
+            _logger.error("Cannot read {}: {}".format(current, error))
+            continue
+        subdirectories = []
+        for entry in entries:
+            # symlinked directories are not followed, they could form a loop
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(".pdf"):
+                yield entry.path
+        pending.extend(reversed(subdirectories))
+
+
+def _is_pattern(path: str) -> bool:
+    """Whether a path that does not exist is a glob pattern"""
+    return not os.path.exists(path) and any(char in path for char in "*?[")
+
+
+def _names_many(input_file: Union[str, Iterable[str]]) -> bool:
+    """Whether an input names several PDFs: a list, a directory or a pattern"""
+    return not isinstance(input_file, str) or os.path.isdir(input_file) or _is_pattern(input_file)
+
+
+def find_pdfs(inputs: Iterable[str]) -> Iterator[str]:
+    """Expand PDF files, directories and glob patterns into PDF files
+
+    Directories are walked recursively for ``.pdf`` files and patterns are
+    expanded with :func:`glob.iglob` (``**`` matches subdirectories). Paths are
+    yielded as they are found, so the extraction starts before a large tree
+    has been listed.
+
+    Args:
+        inputs (Iterable[str]): PDF files, directories or glob patterns
+                                (for example ``submissions/**/*.pdf``)
+
+    Yields:
+        str: path of each PDF file
+    """
+    for path in inputs:
+        if os.path.isdir(path):
+            yield from _walk_pdfs(path)
+        elif _is_pattern(path):
+            for match in glob.iglob(path, recursive=True):
+                if os.path.isfile(match):
+                    yield match
+        else:
+            yield path
+
+
+def read_paths(input_list_file: str) -> Iterator[str]:
+    """Read paths one per line from a file list, ``-`` for stdin
+
+    Args:
+        input_list_file (str): text file with one PDF file, directory or glob
+                               pattern per line
+
+    Yields:
+        str: one path per non blank line
+    """
+    if input_list_file == "-":
+        list_file = sys.stdin
+    else:
+        list_file = open(input_list_file)
+    try:
+        for line in list_file:
+            if line.strip():
+                yield line.rstrip("\r\n")
+    finally:
+        if list_file is not sys.stdin:
+            list_file.close()
+
+
+def _csv_value(value) -> str:
+    """Format a field value for a CSV cell, lists (multi-select) as JSON"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value))
+    return str(value)
+
+
+def _write_jsonl(results: Iterable, output: TextIO) -> Tuple[int, int]:
+    """Write one JSON object per result: path, error and fields"""
+    num_documents = num_errors = 0
+    for result in results:
+        error = None if result.error is None else repr(result.error)
+        row = {"path": result.input_pdf_path, "error": error, "fields": result.fields}
+        output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        num_documents, num_errors = _count_result(result, num_documents, num_errors)
+    return num_documents, num_errors
+
+
+def _write_csv(results: Iterable, output: TextIO) -> Tuple[int, int]:
+    """Write one CSV row per result: path, error and a column per field
+
+    The columns are the fields of the first PDF read, the PDFs of a nightly
+    run are normally all the same form. Fields that are not columns are
+    reported once and left out.
+    """
+    writer = None
+    waiting: List[Dict] = []  # rows of failed PDFs read before the header is known
+    dropped = set()
+    num_documents = num_errors = 0
+    for result in results:
+        num_documents, num_errors = _count_result(result, num_documents, num_errors)
+        row = {"path": result.input_pdf_path, "error": "" if result.error is None else repr(result.error)}
+        if result.fields is not None:
+            if writer is None:
+                writer = csv.DictWriter(output, ["path", "error"] + list(result.fields), extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(waiting)
+                waiting = []
+            for key, value in result.fields.items():
+                row[key] = _csv_value(value)
+                if key not in writer.fieldnames and key not in dropped:
+                    dropped.add(key)
+                    _logger.warning("Field {} of {} is not a column, it is left out".format(key, result.input_pdf_path))
+        if writer is None:
+            waiting.append(row)
+        else:
+            writer.writerow(row)
+    if writer is None:
+        writer = csv.DictWriter(output, ["path", "error"])
+        writer.writeheader()
+        writer.writerows(waiting)
+    return num_documents, num_errors
+
+
+def _count_result(result, num_documents: int, num_errors: int) -> Tuple[int, int]:
+    """Count a result as read, or log it as failed"""
+    if result.error is None:
+        _logger.debug("Read {}".format(result.input_pdf_path))
+        return num_documents + 1, num_errors
+    _logger.error("{} failed: {!r}".format(result.input_pdf_path, result.error))
+    return num_documents, num_errors + 1
+
+
+def extractfillpdf_rows(
+    input_files: Iterable[str],
+    output_file: str,
+    output_format: str = "jsonl",
+    workers: int = 1,
+    index_file: Optional[str] = None,
+) -> int:
+    """Extract the data of many PDFs into one JSON Lines or CSV file
+
+    The PDFs are read on a pool of worker processes and each row is written
+    as soon as its PDF is read, so memory use does not grow with the number
+    of PDFs. Rows hold the source path, the error if the PDF could not be
+    read and its fields. They come in the order the PDFs finish.
+
+    With an index file, the PDFs are looked up in a
+    :class:`fillpdf.fillpdfs.ExtractionIndex` first. Unchanged PDFs are served
+    from it and only new or changed ones are parsed and stored.
+
+    Args:
+        input_files (Iterable[str]): PDF files (for example from :func:`find_pdfs`)
+        output_file (str): Output JSON Lines or CSV file, ``-`` for stdout
+        output_format (str): ``jsonl`` or ``csv``
+        workers (int): number of worker processes
+        index_file (str): SQLite extraction index, created if it does not exist
+
+    Returns:
+        int: number of PDFs read
+    """
+    write = _write_csv if output_format == "csv" else _write_jsonl
+
+    with contextlib.ExitStack() as stack:
+        if index_file is None:
+            results = fillpdfs.get_form_fields_batch(input_files, workers=workers, ordered=False)
+        else:
+            index = stack.enter_context(fillpdfs.ExtractionIndex(index_file))
+            results = index.extract(input_files, workers=workers)
+        if output_file == "-":
+            num_documents, num_errors = write(results, sys.stdout)
+        else:
+            outfile = stack.enter_context(
+                open(output_file, "w", newline="" if output_format == "csv" else None, encoding="utf-8")
+            )
+            num_documents, num_errors = write(results, outfile)
+    if num_errors:
+        _logger.error("{} PDFs could not be read".format(num_errors))
+    return num_documents
+
+
 # ---- CLI ----
 # The functions defined in this section are wrappers around the main Python
 # API allowing them to be called directly from the terminal as a CLI
@@ -70,9 +295,11 @@ def parse_args(args: List[str]) -> argparse.Namespace:
 
     parser = argparse.ArgumentParser(description="Extract fill data from PDF")
     parser.add_argument(
-        dest="inputfile",
-        help="Input pdf file",
+        dest="inputfiles",
+        help="Input pdf files, directories (searched recursively) or glob \
+            patterns",
         type=str,
+        nargs="*",
         metavar="test.pdf",
     )
     parser.add_argument(
@@ -80,14 +307,48 @@ def parse_args(args: List[str]) -> argparse.Namespace:
         "--output",
         dest="outputfile",
         help="Output file to write result, if none given, \
-            it will be the input file with the JSON extension",
+            it will be the input file with the JSON extension. With several \
+            PDFs it is a JSON Lines or CSV file with one row per PDF, '-' \
+            writes to stdout",
         type=str,
         metavar="test.json",
     )
+    parser.add_argument(
+        "--files-from",
+        dest="files_from",
+        help="Text file with one input pdf file, directory or glob pattern per \
+            line, '-' reads stdin",
+        type=str,
+        metavar="paths.txt",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        help="Format of the output with one row per PDF, if none given, it is \
+            taken from the extension (jsonl for anything but .csv)",
+        choices=["jsonl", "csv"],
+    )
+    parser.add_argument(
+        "--index",
+        dest="index_file",
+        help="SQLite extraction index. Only new and changed PDFs are parsed, \
+            the others are read from the index. Writes one row per PDF, also \
+            for a single file",
+        type=str,
+        metavar="fields.sqlite",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        help="Number of worker processes used with several PDFs",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "--version",
-        action="version",
-        version="extractfillpdf {ver}".format(ver=__version__),
+        action=VersionAction,
+        version="extractfillpdf {ver}",
     )
     parser.add_argument(
         "-v",
@@ -108,16 +369,17 @@ def parse_args(args: List[str]) -> argparse.Namespace:
     return parser.parse_args(args)
 
 
-def setup_logging(loglevel: int):
+def setup_logging(loglevel: int, stream: TextIO = sys.stdout):
     """Setup basic logging
 
     Args:
         loglevel (int): minimum loglevel for emitting messages
+        stream (TextIO): where the messages are written
     """
 
     logformat = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
     logging.basicConfig(
-        level=loglevel, stream=sys.stdout, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
+        level=loglevel, stream=stream, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
     )
 
 
@@ -134,7 +396,45 @@ def main(args_m: List[str]):
     """
 
     args = parse_args(args_m)
-    setup_logging(args.loglevel)
+    # rows written to stdout must not be mixed with messages
+    messages = sys.stderr if args.outputfile and args.outputfile.strip() == "-" else sys.stdout
+    setup_logging(args.loglevel, messages)
+
+    # several PDFs, a directory, a pattern, a file list or an index: one row per PDF
+    single = (
+        len(args.inputfiles) == 1
+        and not args.files_from
+        and not args.index_file
+        and not _names_many(args.inputfiles[0])
+    )
+    if not single:
+        if not args.inputfiles and not args.files_from:
+            print("No input PDF given", file=sys.stderr)
+            sys.exit(2)
+        if not args.outputfile:
+            print(
+                "--output is required when extracting several PDFs or using --index",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+        args.outputfile = args.outputfile.strip()
+        inputs: Iterable[str] = args.inputfiles
+        if args.files_from:
+            inputs = itertools.chain(inputs, read_paths(args.files_from.strip()))
+        output_format = args.output_format or (
+            "csv" if args.outputfile.lower().endswith(".csv") else "jsonl"
+        )
+        num_documents = extractfillpdf_rows(
+            find_pdfs(inputs), args.outputfile, output_format, args.workers, args.index_file
+        )
+        print(
+            "{} PDFs have been proccesed to {}".format(num_documents, args.outputfile),
+            file=messages,
+        )
+        _logger.info("Script ends here")
+        return
+
+    args.inputfile = args.inputfiles[0]
 
     # check if outputfile is given, if not, use inputfile with JSON extension
     if args.outputfile:
@@ -147,12 +447,13 @@ def main(args_m: List[str]):
     # trim spaces
     args.outputfile = args.outputfile.strip()
 
-    print(">{}<".format(args.outputfile))
-    num_records = extractfillpdf(args.inputfile, args.outputfile)
+    print(">{}<".format(args.outputfile), file=messages)
+    num_records = extractfillpdf(args.inputfile, args.outputfile, args.output_format, args.workers)
     print(
         "{} records have been proccesed from {} to {}".format(
             num_records, args.inputfile, args.outputfile
-        )
+        ),
+        file=messages,
     )
     _logger.info("Script ends here")
 
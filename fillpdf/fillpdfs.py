@@ -1,11 +1,32 @@
-import fitz
+import contextlib
+import functools
+import hashlib
+import io
+import json
 import math
-import pdfrw
-from pdf2image import convert_from_path # Needs conda install -c conda-forge poppler
-from PIL import Image
-from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
 
 from fillpdf.utils.field_format import is_text_field_multiline, make_read_only
+from fillpdf.utils.lazy import LazyModule
+from fillpdf.utils.metrics import (OperationMetrics, active, current_metrics, finish_operation, measured,
+                                   metrics_sink, set_metrics_sink, start_operation)
+
+# The backends are imported by the first function that uses them, so a
+# program only pays the import time of the ones it calls.
+appearance = LazyModule('fillpdf.utils.appearance')
+asyncio = LazyModule('asyncio')
+fitz = LazyModule('fitz')
+futures = LazyModule('concurrent.futures')
+Image = LazyModule('PIL.Image')
+incremental = LazyModule('fillpdf.utils.incremental')
+pdf2image = LazyModule('pdf2image')     # Needs conda install -c conda-forge poppler
+pdfrw = LazyModule('pdfrw')
+sqlite3 = LazyModule('sqlite3')
 ANNOT_KEY = '/Annots'               # key for all annotations within a page
 ANNOT_FIELD_KEY = '/T'              # Name of field. i.e. given ID of field
 ANNOT_FORM_type = '/FT'             # Form type (e.g. text/button)
@@ -19,41 +40,192 @@ ANNOT_FIELD_PARENT_KEY = '/Parent'  # Parent key for older pdf versions
 ANNOT_FIELD_KIDS_KEY = '/Kids'      # Kids key for older pdf versions
 ANNOT_VAL_KEY = '/V'
 ANNOT_RECT_KEY = '/Rect'
+COMPRESS_SAVE_OPTIONS = dict(garbage=3, deflate=True, use_objstms=1)  # fitz save options used by compress=True
+
+def _pdf_source(input_pdf_path):
+    """
+    Normalizes the accepted pdf inputs. Paths are returned unchanged, file
+    objects are read and bytes-like objects are converted to bytes.
+    """
+    if hasattr(input_pdf_path, 'read'):
+        input_pdf_path = input_pdf_path.read()
+    if isinstance(input_pdf_path, (bytearray, memoryview)):
+        input_pdf_path = bytes(input_pdf_path)
+    return input_pdf_path
+
+
+def _count_read(metrics, source):
+    """
+    Counts the size of the pdf an operation reads. Only the first pdf opened
+    counts, pdfs written and opened again on the way (i.e. to bake them) are
+    not the operation's input.
+    """
+    if metrics.enabled and 'bytes_read' not in metrics.counts:
+        metrics.counts['bytes_read'] = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def _count_written(metrics, output_pdf_path, data=None):
+    """
+    Counts the size of the pdf an operation writes, data when it is returned
+    as bytes. The last pdf written is the operation's output.
+    """
+    if not metrics.enabled:
+        return
+    if data is not None:
+        metrics.counts['bytes_written'] = len(data)
+    elif isinstance(output_pdf_path, (str, os.PathLike)):
+        metrics.counts['bytes_written'] = os.path.getsize(output_pdf_path)
+    elif hasattr(output_pdf_path, 'tell'):
+        metrics.counts['bytes_written'] = output_pdf_path.tell()
+
+
+def _open_pdfrw(input_pdf_path):
+    """
+    Parses a pdf path, bytes or file object with pdfrw.
+    """
+    source = _pdf_source(input_pdf_path)
+    metrics = current_metrics()
+    with metrics.phase('parse'):
+        pdf = pdfrw.PdfReader(fdata=source) if isinstance(source, bytes) else pdfrw.PdfReader(source)
+    _count_read(metrics, source)
+    return pdf
+
+
+def _write_pdfrw(output_pdf_path, trailer, compress=False):
+    """
+    Writes a pdfrw pdf to a path or file object, or returns it as bytes when
+    output_pdf_path is None. pdfrw only writes the objects reachable from the
+    trailer but can't write object streams, so with compress the pdf is saved
+    again by fitz with COMPRESS_SAVE_OPTIONS.
+    """
+    metrics = current_metrics()
+    if compress == True:
+        output = io.BytesIO()
+        with metrics.phase('serialize'):
+            pdfrw.PdfWriter().write(output, trailer)
+        return _save_fitz(_open_fitz(output.getvalue()), output_pdf_path, **COMPRESS_SAVE_OPTIONS)
+    with metrics.phase('serialize'):
+        if output_pdf_path is None:
+            output = io.BytesIO()
+            pdfrw.PdfWriter().write(output, trailer)
+            data = output.getvalue()
+            _count_written(metrics, None, data)
+            return data
+        pdfrw.PdfWriter().write(output_pdf_path, trailer)
+    _count_written(metrics, output_pdf_path)
+
+
+def _open_fitz(input_pdf_path):
+    """
+    Opens a pdf path, bytes or file object with fitz.
+    """
+    source = _pdf_source(input_pdf_path)
+    metrics = current_metrics()
+    with metrics.phase('parse'):
+        doc = fitz.open(stream=source, filetype='pdf') if isinstance(source, bytes) else fitz.open(source)
+    _count_read(metrics, source)
+    return doc
+
+
+def _save_fitz(doc, output_map_path, **kwargs):
+    """
+    Saves a fitz document to a path or file object, or returns it as bytes
+    when output_map_path is None.
+    """
+    metrics = current_metrics()
+    with metrics.phase('serialize'):
+        if output_map_path is None:
+            data = doc.tobytes(**kwargs)
+            _count_written(metrics, None, data)
+            return data
+        doc.save(output_map_path, **kwargs)
+    _count_written(metrics, output_map_path)
+
+
+ENGINES = ('pdfrw', 'pymupdf')                # the values of the engine parameter
 
-def get_form_fields(input_pdf_path, sort=False, page_number=None):
+
+def _check_engine(engine):
+    """
+    Raises a ValueError when engine is not one of ENGINES.
+    """
+    if engine not in ENGINES:
+        raise ValueError("engine must be 'pdfrw' or 'pymupdf'")
+
+
+def _check_page_number(page_number, page_count):
+    """
+    Raises a ValueError when page_number is not a page of the pdf.
+    """
+    if type(page_number) == int:
+        if page_number > 0:
+            if page_number <= page_count:
+                pass
+            else:
+                raise ValueError(f"page_number must be inbetween 1 & {page_count}")
+        else:
+            raise ValueError(f"page_number must be inbetween 1 & {page_count}")
+    else:
+        raise ValueError(f"page_number must be an int")
+
+
+@measured('get_form_fields')
+def get_form_fields(input_pdf_path, sort=False, page_number=None, field_names=None, engine='pdfrw'):
     """
     Retrieves the form fields from a pdf to then be stored as a dictionary and
-    passed to the write_fillable_pdf() function. Uses pdfrw.
+    passed to the write_fillable_pdf() function. Uses pdfrw, or fitz with
+    engine='pymupdf'.
     Parameters
     ---------
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    sort: bool
+        Default is False meaning the pdf order is kept. True sorts the
+        dictionary alphabetically.
+    page_number: int
+        Only return the fields of this page.
+    field_names: iterable
+        Only return these fields, keyed like the full dictionary. To stop
+        reading as soon as some fields are found, use iter_form_fields().
+    engine: str
+        Default is 'pdfrw'. 'pymupdf' reads the fields with fitz and returns
+        the same keys and values.
     Returns
     ---------
     A dictionary of form fields and their filled values.
     """
+    _check_engine(engine)
+    if engine == 'pymupdf':
+        data_dict = _get_form_fields_fitz(input_pdf_path, page_number)
+    else:
+        data_dict = _get_form_fields_pdfrw(input_pdf_path, page_number)
+    if field_names is not None:
+        field_names = set(field_names)
+        data_dict = {key: value for key, value in data_dict.items() if key in field_names}
+    if sort == True:
+        return dict(sorted(data_dict.items()))
+    else:
+        return data_dict
+
+
+def _get_form_fields_pdfrw(input_pdf_path, page_number):
+    """
+    Reads the fields of every widget annotation for get_form_fields().
+    """
     data_dict = {}
 
-    pdf = pdfrw.PdfReader(input_pdf_path)
-    count = 1
+    pdf = _open_pdfrw(input_pdf_path)
     if page_number is not None:
-        if type(page_number) == int:
-            if page_number > 0:
-                if page_number <= len(pdf.pages):
-                    pass
-                else:
-                    raise ValueError(f"page_number must be inbetween 1 & {len(pdf.pages)}")
-            else:
-                raise ValueError(f"page_number must be inbetween 1 & {len(pdf.pages)}")
-        else:
-            raise ValueError(f"page_number must be an int")
-    for page in pdf.pages:
-        if page_number is not None:
-            if count != page_number:
-                count += 1
-                continue
-            else:
-                print(f"Values From Page {page_number}")
+        _check_page_number(page_number, len(pdf.pages))
+    pages = pdf.pages
+    if page_number is not None:
+        pages = [pdf.pages[page_number - 1]]
+        print(f"Values From Page {page_number}")
+    metrics = current_metrics()
+    fields_start = metrics.clock()
+    for page in pages:
+        page_start = metrics.clock()
         annotations = page[ANNOT_KEY]
         if annotations:
             for annotation in annotations:
@@ -85,12 +257,141 @@ def get_form_fields(input_pdf_path, sort=False, page_number=None):
                                     data_dict[key] = annotation[ANNOT_VAL_KEY][1:]
                         except:
                             pass
-        if count == page_number:
-            break
-    if sort == True:
-        return dict(sorted(data_dict.items()))
-    else:
-        return data_dict
+        metrics.page(page_start)
+    metrics.record('fields', fields_start)
+    metrics.count(fields=len(data_dict), pages=len(pages))
+    return data_dict
+
+
+def _fitz_field_value(page, xref, value):
+    """
+    Converts a value from fitz xref_get_key() to the python value
+    get_form_fields() returns for it.
+    """
+    value_type, value = value
+    if value_type == 'name':
+        return value[1:] if value.startswith('/') else value
+    if value_type == 'array':
+        # i.e. the selected options of a list box
+        return page.load_widget(xref).field_value
+    return value
+
+
+def _get_form_fields_fitz(input_pdf_path, page_number):
+    """
+    Reads the fields of every widget annotation for get_form_fields() with
+    fitz, keyed and decoded like _get_form_fields_pdfrw().
+    """
+    data_dict = {}
+
+    doc = _open_fitz(input_pdf_path)
+    if page_number is not None:
+        _check_page_number(page_number, doc.page_count)
+    pages = range(doc.page_count)
+    if page_number is not None:
+        pages = [page_number - 1]
+        print(f"Values From Page {page_number}")
+    metrics = current_metrics()
+    fields_start = metrics.clock()
+    for index in pages:
+        page_start = metrics.clock()
+        page = doc[index]
+        for xref, annot_type, _ in page.annot_xrefs():
+            if annot_type != fitz.PDF_ANNOT_WIDGET:
+                continue
+            field_type, key = doc.xref_get_key(xref, 'T')
+            if field_type != 'null':
+                value = doc.xref_get_key(xref, 'V')
+                data_dict[key] = '' if value[0] == 'null' else _fitz_field_value(page, xref, value)
+            elif doc.xref_get_key(xref, 'AP')[0] != 'null':
+                key = doc.xref_get_key(xref, 'Parent/T')[1]
+                value = doc.xref_get_key(xref, 'Parent/V')
+                data_dict[key] = None if value[0] == 'null' else _fitz_field_value(page, xref, value)
+        metrics.page(page_start)
+    metrics.record('fields', fields_start)
+    metrics.count(fields=len(data_dict), pages=len(pages))
+    doc.close()
+    return data_dict
+
+
+def _decode_field_value(value):
+    """
+    Converts a raw /V value to the same python value get_form_fields() returns.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, pdfrw.objects.pdfstring.PdfString):
+        return value.decode()
+    if isinstance(value, pdfrw.objects.pdfname.BasePdfName):
+        return value[1:] if value.startswith('/') else value
+    if isinstance(value, pdfrw.PdfArray):
+        return [_decode_field_value(each) for each in value]
+    return value
+
+
+def iter_form_fields(input_pdf_path, field_names=None):
+    """
+    Yields the form fields of a pdf by walking the /Root/AcroForm/Fields tree
+    instead of every page's annotations. pdfrw loads objects on first use, so
+    pages, annotations and streams that are not fields are never read, and each
+    value is only decoded when it is yielded. Uses pdfrw.
+    Parameters
+    ---------
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    field_names: iterable
+        Only yield these fields, and stop as soon as all of them are found.
+        Names are fully qualified, as used by write_fillable_pdf().
+    Returns
+    ---------
+    Yields (name, value) for each field, in the order of the fields tree.
+    """
+    # The generator is suspended between fields, so its own operation is only
+    # made the current one while it parses, not while the caller runs.
+    metrics = start_operation('iter_form_fields')
+    error = None
+    try:
+        with active(metrics) if metrics is not None else contextlib.nullcontext():
+            pdf = _open_pdfrw(input_pdf_path)
+        yield from _walk_form_fields(pdf, field_names, metrics or current_metrics())
+    except GeneratorExit:
+        raise
+    except BaseException as raised:
+        error = raised
+        raise
+    finally:
+        if metrics is not None:
+            finish_operation(metrics, error)
+
+
+def _walk_form_fields(pdf, field_names, metrics):
+    """
+    Yields the (name, value) of the fields of a parsed pdf for
+    iter_form_fields(), counting them in metrics.
+    """
+    if pdf.Root.AcroForm is None or not pdf.Root.AcroForm.Fields:
+        return
+    wanted = set(field_names) if field_names is not None else None
+    pending = list(reversed(pdf.Root.AcroForm.Fields))
+    while pending:
+        field = pending.pop()
+        kids = field[ANNOT_FIELD_KIDS_KEY]
+        if kids and any(kid[ANNOT_FIELD_KEY] for kid in kids):
+            pending.extend(reversed(kids))
+            continue
+        if not field[ANNOT_FIELD_KEY]:
+            continue
+        key = _field_name(field)
+        if wanted is None:
+            metrics.count(fields=1)
+            yield key, _decode_field_value(field[ANNOT_VAL_KEY])
+        elif key in wanted:
+            metrics.count(fields=1)
+            yield key, _decode_field_value(field[ANNOT_VAL_KEY])
+            wanted.discard(key)
+            if not wanted:
+                return
 
 
 def print_form_fields(input_pdf_path, sort=False, page_number=None):
@@ -99,8 +400,9 @@ def print_form_fields(input_pdf_path, sort=False, page_number=None):
     the data_dict. Uses pdfrw.
     Parameters
     ---------
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
     Returns
     ---------
     """
@@ -108,45 +410,314 @@ def print_form_fields(input_pdf_path, sort=False, page_number=None):
     print("{" + ",\n".join("{!r}: {!r}".format(k, v) for k, v in data_dict.items()) + "}")
 
 
-def flatten_pdf(input_pdf_path, output_pdf_path, as_images=False):
+FieldSchema = namedtuple('FieldSchema', ['name', 'kind', 'options', 'export_states', 'flags', 'max_length', 'page', 'rect', 'widgets'])
+FieldSchema.__doc__ = """
+The structure of a form field, as returned by get_form_schema().
+Parameters
+---------
+name: str
+    The fully qualified name of the field, the key used in the data_dict.
+kind: str
+    One of 'text', 'checkbox', 'radio', 'combo' (combo and list boxes) or
+    None when the field type is not supported, like FormField.kind.
+options: list
+    The options of a combo box or radio group, None otherwise.
+export_states: list
+    The on states of a checkbox or radio group, None otherwise.
+flags: int
+    The field flags (/Ff), i.e. read only, multiline or combo.
+max_length: int
+    The maximum length of a text field (/MaxLen), None when unlimited.
+page: int
+    The page of the field's first widget, starting at 1.
+rect: list
+    The rectangle [x0, y0, x1, y1] of the field's first widget.
+widgets: list
+    [page, rect] of every widget of the field, in the order of export_states
+    for a radio group.
+"""
+
+SCHEMA_CACHE_VERSION = 1                 # bump when FieldSchema changes, older cache files are rebuilt
+
+
+def _schema_cache_path(source, digest, cache_dir):
+    """
+    Returns the cache file of a schema: <digest>.json in cache_dir, else a
+    sidecar next to the template, None for a pdf given as bytes without
+    cache_dir.
+    """
+    if cache_dir is not None:
+        return os.path.join(cache_dir, digest + '.json')
+    if isinstance(source, bytes):
+        return None
+    return os.fspath(source) + '.schema.json'
+
+
+def _read_schema_cache(cache_path, digest):
+    """
+    Returns the schema stored in cache_path for the content hash digest, or
+    None when there is none or it belongs to another version of the pdf.
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            cached = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cached.get('sha256') != digest or cached.get('version') != SCHEMA_CACHE_VERSION:
+        return None
+    try:
+        return {field['name']: FieldSchema(**field) for field in cached['fields']}
+    except (KeyError, TypeError):
+        return None
+
+
+def _write_schema_cache(cache_path, digest, schema):
+    """
+    Stores a schema in cache_path, atomically so concurrent readers never see
+    half a file. The cache is only an optimization, a directory that can't
+    be written to is skipped.
+    """
+    cached = {'sha256': digest, 'version': SCHEMA_CACHE_VERSION, 'fields': [field._asdict() for field in schema.values()]}
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as cache_file:
+                json.dump(cached, cache_file, ensure_ascii=False)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError:
+        pass
+
+
+def _form_schema(pdf):
+    """
+    Builds the FieldSchema of every field in one walk over the widget
+    annotations of a parsed pdf.
+    """
+    fields = OrderedDict()
+    widgets = {}
+    for page_number, page in enumerate(pdf.pages, 1):
+        annotations = page[ANNOT_KEY]
+        if not annotations:
+            continue
+        for annotation in annotations:
+            if annotation[SUBTYPE_KEY] != WIDGET_SUBTYPE_KEY:
+                continue
+            target = annotation if annotation[ANNOT_FIELD_KEY] else annotation[ANNOT_FIELD_PARENT_KEY]
+            if not target or not target[ANNOT_FIELD_KEY]:
+                continue
+            key = _field_name(target)
+            if key not in fields:
+                fields[key] = _form_field(key, target, annotation)
+                widgets[key] = []
+            rect = [float(each) for each in annotation[ANNOT_RECT_KEY]] if annotation[ANNOT_RECT_KEY] else None
+            widgets[key].append([page_number, rect])
+    schema = {}
+    for key, field in fields.items():
+        target = field.target
+        max_length = target['/MaxLen']
+        schema[key] = FieldSchema(key, field.kind, field.options, field.export_states, int(target['/Ff'] or 0),
+                                  int(max_length) if max_length is not None else None,
+                                  widgets[key][0][0], widgets[key][0][1], widgets[key])
+    return schema
+
+
+@measured('get_form_schema')
+def get_form_schema(input_pdf_path, cache=True, cache_dir=None):
+    """
+    Extracts the type, options, export states, flags, page and rect of every
+    form field in one pass. The schema is cached on disk keyed by the
+    sha256 of the pdf, so looking it up again for an unchanged template
+    only costs hashing the file. Uses pdfrw.
+    Parameters
+    ---------
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the schema of, or the pdf itself
+        as bytes or a binary file object.
+    cache: bool
+        Default is True. False always parses the pdf and writes no cache.
+    cache_dir: str
+        Directory the cache files are kept in, named after the content hash.
+        Default is None meaning a sidecar file next to the pdf
+        (blank.pdf.schema.json), pdfs given as bytes are then not cached.
+    Returns
+    ---------
+    schema: dict
+        Field name to FieldSchema, in page order.
+    """
+    source = _pdf_source(input_pdf_path)
+    metrics = current_metrics()
+    cache_path = None
+    if cache == True:
+        with metrics.phase('hash'):
+            if isinstance(source, bytes):
+                digest = hashlib.sha256(source).hexdigest()
+            else:
+                digest = _file_sha256(source)
+        cache_path = _schema_cache_path(source, digest, cache_dir)
+        if cache_path is not None:
+            schema = _read_schema_cache(cache_path, digest)
+            if schema is not None:
+                metrics.count(fields=len(schema))
+                return schema
+
+    pdf = _open_pdfrw(source)
+    with metrics.phase('fields'):
+        schema = _form_schema(pdf)
+    metrics.count(fields=len(schema), pages=len(pdf.pages))
+    if cache_path is not None:
+        _write_schema_cache(cache_path, digest, schema)
+    return schema
+
+
+def _bake_pdf(input_pdf_path, output_pdf_path, compress=False):
+    """
+    Merges every widget's appearance stream into its page's content and
+    removes the widgets and form fields, using fitz. When the form asks for
+    its appearances to be regenerated (NeedAppearances), or a text value was
+    written as a plain string in /AP, the text and choice appearances are
+    dropped first so fitz rebuilds them from the field values.
+    """
+    doc = _open_fitz(input_pdf_path)
+    _bake_document(doc)
+    if compress == True:
+        return _save_fitz(doc, output_pdf_path, **COMPRESS_SAVE_OPTIONS)
+    return _save_fitz(doc, output_pdf_path, garbage=3, deflate=True)
+
+
+def _bake_document(doc):
+    """
+    Bakes the widgets of an open fitz document, see _bake_pdf().
+    """
+    metrics = current_metrics()
+    bake_start = metrics.clock()
+    catalog = doc.pdf_catalog()
+    need_appearances = doc.xref_get_key(catalog, 'AcroForm/NeedAppearances')[1] == 'true'
+    for page in doc:
+        for xref, annot_type, _ in page.annot_xrefs():
+            if annot_type != fitz.PDF_ANNOT_WIDGET:
+                continue
+            field_type = doc.xref_get_key(xref, 'FT')[1]
+            if field_type == 'null':
+                field_type = doc.xref_get_key(xref, 'Parent/FT')[1]
+            if doc.xref_get_key(xref, 'AP')[0] == 'string' or (need_appearances and field_type in ('/Tx', '/Ch')):
+                doc.xref_set_key(xref, 'AP', 'null')
+    doc.bake(annots=False, widgets=True)
+    metrics.record('bake', bake_start)
+    if metrics.enabled:
+        # write_fillable_pdf counted the pages already when it bakes its output
+        metrics.counts.setdefault('pages', doc.page_count)
+
+
+def _flatten_pdf_as_images(input_pdf_path, output_pdf_path, dpi, chunk_size, thread_count):
+    """
+    Renders the pdf chunk_size pages at a time and appends each chunk to the
+    output, so peak memory stays flat as the page count grows. Pages keep
+    their size because the images are placed at the dpi they were rendered at.
+    """
+    source = _pdf_source(input_pdf_path)
+    metrics = current_metrics()
+    _count_read(metrics, source)
+    if isinstance(source, bytes):
+        page_count = pdf2image.pdfinfo_from_bytes(source)['Pages']
+        render = functools.partial(pdf2image.convert_from_bytes, source)
+    else:
+        page_count = pdf2image.pdfinfo_from_path(source)['Pages']
+        render = functools.partial(pdf2image.convert_from_path, source)
+
+    # Appending reads back what was written, so anything but a path is
+    # written to memory first.
+    output = output_pdf_path if isinstance(output_pdf_path, (str, os.PathLike)) else io.BytesIO()
+    for first_page in range(1, page_count + 1, chunk_size):
+        last_page = min(first_page + chunk_size - 1, page_count)
+        with metrics.phase('render'):
+            images = render(dpi=dpi, first_page=first_page, last_page=last_page, thread_count=thread_count)
+        with metrics.phase('serialize'):
+            images[0].save(output, "PDF", resolution=float(dpi), save_all=True, append_images=images[1:],
+                           append=first_page > 1)
+        for image in images:
+            image.close()
+    metrics.count(pages=page_count)
+    if output_pdf_path is None:
+        data = output.getvalue()
+        _count_written(metrics, None, data)
+        return data
+    if output is not output_pdf_path:
+        output_pdf_path.write(output.getvalue())
+    _count_written(metrics, output_pdf_path)
+
+
+@measured('flatten_pdf')
+def flatten_pdf(input_pdf_path, output_pdf_path, as_images=False, dpi=200, chunk_size=10, thread_count=1, as_vector=False, compress=False, engine='pdfrw'):
     """
     Flattens the pdf so each annotation becomes uneditable. This function provides
     two ways to do so, either with the pdfrw function annotation.update(pdfrw.PdfDict(Ff=1))
     or converting the pages to images then reinserting.
     Parameters
     ---------
-    input_pdf_path: str
-        Path to the pdf you want to flatten.
-    output_pdf_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want to flatten, or the pdf itself
+        as bytes or a binary file object.
+    output_pdf_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     as_images: bool
         Default is False meaning it will update each individual annotation and set
         it to False. True means it will convert to images and then reinsert into the
         pdf
+    dpi: int
+        Resolution the pages are rendered at when as_images is True.
+    chunk_size: int
+        Number of pages rendered and appended at a time when as_images is True.
+        Only one chunk of images is held in memory, whatever the page count.
+    thread_count: int
+        Number of poppler processes rendering each chunk when as_images is True.
+    as_vector: bool
+        Default is False. True merges each field's appearance into the page
+        content and removes the fields, keeping text and graphics as vectors.
+    compress: bool
+        Default is False. True deflates the streams, packs the objects into
+        compressed object streams and drops unreferenced objects. Not used
+        with as_images.
+    engine: str
+        Default is 'pdfrw'. 'pymupdf' makes the fields read only with fitz,
+        which also rebuilds their appearances. Not used with as_images or
+        as_vector.
     Returns
     ---------
+    The pdf as bytes when output_pdf_path is None.
     """
+    _check_engine(engine)
     if as_images == True:
-        images = convert_from_path(input_pdf_path) 
-        im1 = images[0]
-        images.pop(0)
-
-        pdf1_filename = output_pdf_path
-
-        im1.save(pdf1_filename, "PDF" ,resolution=100.0, save_all=True, append_images=images)
+        return _flatten_pdf_as_images(input_pdf_path, output_pdf_path, dpi, chunk_size, thread_count)
+    elif as_vector == True:
+        return _bake_pdf(input_pdf_path, output_pdf_path, compress)
+    elif engine == 'pymupdf':
+        with PdfEditor(input_pdf_path, output_pdf_path, **(COMPRESS_SAVE_OPTIONS if compress == True else {})) as editor:
+            editor.fill({}, flatten=True)
+        return editor.result
     else:
         ANNOT_KEY = '/Annots'               # key for all annotations within a page
 
-        template_pdf = pdfrw.PdfReader(input_pdf_path)
+        template_pdf = _open_pdfrw(input_pdf_path)
+        metrics = current_metrics()
+        flatten_start = metrics.clock()
         for Page in template_pdf.pages:
+            page_start = metrics.clock()
             if Page[ANNOT_KEY]:
                 for annotation in Page[ANNOT_KEY]:
                     annotation.update(pdfrw.PdfDict(Ff=1))
+            metrics.page(page_start)
+        metrics.record('flatten', flatten_start)
+        metrics.count(pages=len(template_pdf.pages))
         if template_pdf.Root.AcroForm is not None:
             template_pdf.Root.AcroForm.update(pdfrw.PdfDict(NeedAppearances=pdfrw.PdfObject('true')))
         else:
             print("Warning: Form Not Found")
-        pdfrw.PdfWriter().write(output_pdf_path, template_pdf)
+        return _write_pdfrw(output_pdf_path, template_pdf, compress)
         
 
 def convert_dict_values_to_string(dictionary):
@@ -178,81 +749,83 @@ def convert_dict_values_to_string(dictionary):
     return res    
     
     
-def write_fillable_pdf(input_pdf_path, output_pdf_path, data_dict, flatten=False):
+@measured('write_fillable_pdf')
+def write_fillable_pdf(input_pdf_path, output_pdf_path, data_dict, flatten=False, as_vector=False, incremental=False, compress=False, engine='pdfrw'):
     """
     Writes the dictionary values to the pdf. Currently supports text and buttons.
     Does so by updating each individual annotation with the contents of the dat_dict.
     Parameters
     ---------
-    input_pdf_path: str
-        Path to the pdf you want to flatten.
-    output_pdf_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes, file or FormTemplate
+        Path to the pdf you want to flatten, or the pdf itself
+        as bytes or a binary file object. A FormTemplate skips parsing and
+        only visits the fields named in the data_dict.
+    output_pdf_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     data_dict: dict
         The data_dict returned from the function get_form_fields()
     flatten: bool
         Default is False meaning it will stay editable. True means the annotations
         will be uneditable.
+    as_vector: bool
+        Default is False. With flatten, True merges each field's appearance into
+        the page content and removes the fields, like flatten_pdf(as_vector=True).
+    incremental: bool
+        Default is False meaning the whole pdf is written again. True writes the
+        original bytes unchanged followed by an incremental update holding only
+        the modified field and AcroForm objects. Not used with as_vector.
+    compress: bool
+        Default is False. True deflates the streams, packs the objects into
+        compressed object streams and drops unreferenced objects, like the
+        fitz save options garbage=3, deflate=True, use_objstms=1. Not used
+        when incremental writes an update.
+    engine: str
+        Default is 'pdfrw'. 'pymupdf' fills the fields with fitz, which also
+        builds the appearance of every field it fills. The data_dict is the
+        same for both engines.
     Returns
     ---------
+    The pdf as bytes when output_pdf_path is None.
     """
+    _check_engine(engine)
+    if engine == 'pymupdf':
+        return _write_fillable_pdf_fitz(input_pdf_path, output_pdf_path, data_dict, flatten, as_vector, incremental, compress)
+    if isinstance(input_pdf_path, FormTemplate):
+        return input_pdf_path.write(output_pdf_path, data_dict, flatten, as_vector, incremental, compress)
+    if incremental == True:
+        return FormTemplate(input_pdf_path).write(output_pdf_path, data_dict, flatten, as_vector, incremental, compress)
+
     data_dict = convert_dict_values_to_string(data_dict)
 
-    template_pdf = pdfrw.PdfReader(input_pdf_path)
+    template_pdf = _open_pdfrw(input_pdf_path)
+    acroform = template_pdf.Root.AcroForm
+    radio_groups = {}
+    need_appearances = False
+    metrics = current_metrics()
+    filled = set()
+    fill_start = metrics.clock()
     for Page in template_pdf.pages:
+        page_start = metrics.clock()
         if Page[ANNOT_KEY]:
             for annotation in Page[ANNOT_KEY]:
                 target = annotation if annotation[ANNOT_FIELD_KEY] else annotation[ANNOT_FIELD_PARENT_KEY]
                 if annotation[ANNOT_FORM_type] == None:
                     pass
                 if target and annotation[SUBTYPE_KEY] == WIDGET_SUBTYPE_KEY:
-                    key = target[ANNOT_FIELD_KEY][1:-1] # Remove parentheses
-                    target_aux = target
-                    while target_aux['/Parent']:
-                        key = target['/Parent'][ANNOT_FIELD_KEY][1:-1] + '.' + key
-                        target_aux = target_aux['/Parent']
-                    if key in data_dict.keys():
+                    key = _field_name(target)
+                    if key in data_dict:
+                        if metrics.enabled:
+                            filled.add(key)
                         if target[ANNOT_FORM_type] == ANNOT_FORM_button:
                             # button field i.e. a radiobuttons
                             if not annotation['/T']:
                                 if annotation['/AP']:
-                                    keys = annotation['/AP']['/N'].keys()
-                                    if keys[0]:
-                                        if keys[0][0] == '/':
-                                            keys[0] = str(keys[0][1:])
-                                    list_delim, tuple_delim = '-', '^'
-                                    res = dict()
-                                    for sub in data_dict:
-                                        if isinstance(data_dict[sub], list):
-                                            res[sub] = list_delim.join([str(ele) for ele in data_dict[sub]]) 
-                                        else:
-                                            res[sub] = str(data_dict[sub])
-                                    temp_dict = res
-                                    annotation = annotation['/Parent']
-                                    options = []
-                                    for each in annotation['/Kids']:
-                                        keys2 = each['/AP']['/N'].keys()
-                                        if '/Off' in keys2:
-                                            keys2.remove('/Off')
-                                        if ['/Off'] in keys:
-                                            keys2.remove('/Off')
-                                        export = keys2[0]
-                                        if '/' in export:
-                                            options.append(export[1:])
-                                        else:
-                                            options.append(export)
-                                        if f'/{data_dict[key]}' == export:
-                                            val_str = pdfrw.objects.pdfname.BasePdfName(f'/{data_dict[key]}')
-                                        else:
-                                            val_str = pdfrw.objects.pdfname.BasePdfName(f'/Off')
-                                        if set(keys).intersection(set(temp_dict.values())):
-                                            each.update(pdfrw.PdfDict(AS=val_str))
-                                    if data_dict[key] not in options:
-                                        if data_dict[key] != "None"  and data_dict[key] != "":
-                                            raise KeyError(f"{data_dict[key]} Not An Option, Options are {options}")
-                                    else:
-                                        if set(keys).intersection(set(temp_dict.values())):
-                                            annotation.update(pdfrw.PdfDict(V=pdfrw.objects.pdfname.BasePdfName(f'/{data_dict[key]}')))
+                                    # The whole group is filled from its first kid, the
+                                    # export states of every kid are resolved only once.
+                                    if id(target) not in radio_groups:
+                                        radio_groups[id(target)] = _form_field(key, target, annotation)
+                                        _fill_form_field(radio_groups[id(target)], data_dict[key], acroform)
+                                    annotation = target
                             else:
                                 # button field i.e. a checkbox
                                 target.update( pdfrw.PdfDict( V=pdfrw.PdfName(data_dict[key]) , AS=pdfrw.PdfName(data_dict[key]) ))
@@ -286,17 +859,1564 @@ def write_fillable_pdf(input_pdf_path, output_pdf_path, data_dict, flatten=False
                                         raise KeyError(f"{data_dict[key]} Not An Option For {annotation[ANNOT_FIELD_KEY]}, Options are {options}")
                                 pdfstr = pdfrw.objects.pdfstring.PdfString.encode(data_dict[key])
                             annotation.update(pdfrw.PdfDict(V=pdfstr, AS=pdfstr))
+                            if _is_combo_box(target) and type(data_dict[key]) != list:
+                                need_appearances |= _set_text_appearances([annotation], target, data_dict[key], acroform)
+                            else:
+                                need_appearances = True
                         elif target[ANNOT_FORM_type] == ANNOT_FORM_text:
                             # regular text field
-                            target.update( pdfrw.PdfDict( V=data_dict[key], AP=data_dict[key]) )
-                            if target[ANNOT_FIELD_KIDS_KEY]:
-                                target[ANNOT_FIELD_KIDS_KEY][0].update( pdfrw.PdfDict( V=data_dict[key], AP=data_dict[key]) )
+                            target.update( pdfrw.PdfDict( V=data_dict[key]) )
+                            need_appearances |= _set_text_appearances([annotation], target, data_dict[key], acroform)
                 if flatten == True:
                     annotation.update(pdfrw.PdfDict(Ff=make_read_only(target["/Ff"])))
-    template_pdf.Root.AcroForm.update(pdfrw.PdfDict(NeedAppearances=pdfrw.PdfObject('true')))
-    pdfrw.PdfWriter().write(output_pdf_path, template_pdf)
+        metrics.page(page_start)
+    metrics.record('fill', fill_start)
+    metrics.count(fields=len(filled), pages=len(template_pdf.pages))
+    if need_appearances and acroform is not None:
+        acroform.update(pdfrw.PdfDict(NeedAppearances=pdfrw.PdfObject('true')))
+    if flatten == True and as_vector == True:
+        return _bake_pdf(_write_pdfrw(None, template_pdf), output_pdf_path, compress)
+    return _write_pdfrw(output_pdf_path, template_pdf, compress)
+
+
+def _write_fillable_pdf_fitz(input_pdf_path, output_pdf_path, data_dict, flatten, as_vector, incremental, compress):
+    """
+    write_fillable_pdf() with engine='pymupdf', filling the pdf in a PdfEditor.
+    """
+    if isinstance(input_pdf_path, FormTemplate):
+        input_pdf_path = input_pdf_path.source
+    bake = flatten == True and as_vector == True
+    incremental = incremental == True and not bake
+    if incremental:
+        save_options = {}
+    elif compress == True:
+        save_options = COMPRESS_SAVE_OPTIONS
+    elif bake:
+        save_options = dict(garbage=3, deflate=True)
+    else:
+        save_options = {}
+    with PdfEditor(input_pdf_path, output_pdf_path, incremental=incremental, **save_options) as editor:
+        editor.fill(data_dict, flatten)
+        if bake:
+            _bake_document(editor.doc)
+    return editor.result
+
+
+FormField = namedtuple('FormField', ['name', 'kind', 'target', 'widgets', 'options', 'export_states'])
+FormField.__doc__ = """
+A fillable field of a FormTemplate.
+Parameters
+---------
+name: str
+    The fully qualified name of the field, the key used in the data_dict.
+kind: str
+    One of 'text', 'checkbox', 'radio', 'combo' or None when the field type
+    is not supported.
+target: pdfrw.PdfDict
+    The field dictionary that holds the value.
+widgets: list
+    The widget annotations that display the field.
+options: list
+    The options of a combo box or radio group, None otherwise.
+export_states: list
+    The on states of a checkbox or radio group, None otherwise.
+"""
+
+
+def _field_name(target):
+    """
+    Builds the fully qualified name of a field by walking its /Parent chain.
+    """
+    key = target[ANNOT_FIELD_KEY][1:-1] # Remove parentheses
+    parent = target[ANNOT_FIELD_PARENT_KEY]
+    while parent:
+        if parent[ANNOT_FIELD_KEY]:
+            key = parent[ANNOT_FIELD_KEY][1:-1] + '.' + key
+        parent = parent[ANNOT_FIELD_PARENT_KEY]
+    return key
+
+
+def _export_state(widget):
+    """
+    Returns the on state of a button widget without the leading slash, or None
+    if the widget has no normal appearance.
+    """
+    if not widget['/AP'] or not widget['/AP']['/N']:
+        return None
+    for state in widget['/AP']['/N'].keys():
+        if state != '/Off':
+            return state[1:] if state.startswith('/') else state
+    return None
+
+
+def _combo_options(target):
+    """
+    Decodes the /Opt array of a combo box into a list of strings.
+    """
+    options = target[ANNOT_FORM_options]
+    if not options:
+        return []
+    options = list(options)
+    if type(options[0]) == pdfrw.objects.pdfarray.PdfArray:
+        options = [x[0] for x in options]
+    if type(options[0]) == pdfrw.objects.pdfstring.PdfString:
+        options = [pdfrw.objects.pdfstring.PdfString.decode(x) for x in options]
+    return options
+
+
+def _form_field(key, target, annotation):
+    """
+    Builds the FormField for a field from its field dictionary and the first
+    widget annotation found for it, resolving its kind, options and export
+    states once.
+    """
+    kind = None
+    options = None
+    export_states = None
+    if target[ANNOT_FORM_type] == ANNOT_FORM_button:
+        if target is not annotation:
+            kind = 'radio'
+            export_states = [_export_state(kid) for kid in target[ANNOT_FIELD_KIDS_KEY] or [annotation]]
+            options = [state for state in export_states if state is not None]
+        else:
+            kind = 'checkbox'
+            export_states = [state for state in [_export_state(annotation)] if state is not None]
+    elif target[ANNOT_FORM_type] == ANNOT_FORM_combo:
+        kind = 'combo'
+        options = _combo_options(target)
+    elif target[ANNOT_FORM_type] == ANNOT_FORM_text:
+        kind = 'text'
+    return FormField(key, kind, target, [annotation], options, export_states)
+
+
+def _index_form_fields(pages):
+    """
+    Walks the widget annotations of every page once and groups them by fully
+    qualified field name.
+    Parameters
+    ---------
+    pages: list
+        The pdfrw pages of the template.
+    Returns
+    ---------
+    fields: OrderedDict
+        Field name to FormField, in page order.
+    """
+    fields = OrderedDict()
+    for page in pages:
+        annotations = page[ANNOT_KEY]
+        if not annotations:
+            continue
+        for annotation in annotations:
+            if annotation[SUBTYPE_KEY] != WIDGET_SUBTYPE_KEY:
+                continue
+            target = annotation if annotation[ANNOT_FIELD_KEY] else annotation[ANNOT_FIELD_PARENT_KEY]
+            if not target or not target[ANNOT_FIELD_KEY]:
+                continue
+            key = _field_name(target)
+            if key in fields:
+                fields[key].widgets.append(annotation)
+                continue
+            fields[key] = _form_field(key, target, annotation)
+    return fields
+
+
+def _is_combo_box(target):
+    """
+    Returns whether a /Ch field is a combo box (Ff bit 18) rather than a list box.
+    """
+    return bool(int(target['/Ff'] or 0) & (1 << 17))
+
+
+def _set_text_appearances(widgets, target, value, acroform):
+    """
+    Gives each widget a normal appearance stream showing value, laid out with
+    the field's /DA. A widget the stream cannot be built for loses its stale
+    appearance instead.
+    Returns
+    ---------
+    need_appearances: bool
+        True when a viewer still has to build an appearance (NeedAppearances).
+    """
+    need_appearances = False
+    metrics = current_metrics()
+    appearances_start = metrics.clock()
+    for widget in widgets:
+        appearance_stream = appearance.text_appearance(widget, target, acroform, value)
+        if appearance_stream is None:
+            need_appearances = True
+            widget.AP = None
+        else:
+            widget.AP = pdfrw.PdfDict(N=appearance_stream)
+    metrics.record('appearances', appearances_start)
+    return need_appearances
+
+
+def _fill_form_field(field, value, acroform=None):
+    """
+    Writes a single value, already converted by convert_dict_values_to_string(),
+    into a FormField. Text and combo box values get their appearance streams.
+    Returns
+    ---------
+    need_appearances: bool
+        True when a viewer still has to build an appearance (NeedAppearances).
+    """
+    target = field.target
+    if field.kind == 'radio':
+        if value not in field.options:
+            if value != "None" and value != "":
+                raise KeyError(f"{value} Not An Option, Options are {field.options}")
+            return False
+        for kid, state in zip(target[ANNOT_FIELD_KIDS_KEY] or field.widgets, field.export_states):
+            kid.update(pdfrw.PdfDict(AS=pdfrw.PdfName(value if state == value else 'Off')))
+        target.update(pdfrw.PdfDict(V=pdfrw.PdfName(value)))
+    elif field.kind == 'checkbox':
+        target.update(pdfrw.PdfDict(V=pdfrw.PdfName(value), AS=pdfrw.PdfName(value)))
+        if target[ANNOT_FIELD_KIDS_KEY]:
+            target[ANNOT_FIELD_KIDS_KEY][0].update(pdfrw.PdfDict(V=pdfrw.PdfName(value), AS=pdfrw.PdfName(value)))
+    elif field.kind == 'combo':
+        if type(value) == list:
+            pdfstr = pdfrw.objects.pdfarray.PdfArray(
+                [pdfrw.objects.pdfstring.PdfString.encode(each) for each in field.options if each in value])
+        else:
+            if value not in field.options and value != "None" and value != "":
+                raise KeyError(f"{value} Not An Option For {target[ANNOT_FIELD_KEY]}, Options are {field.options}")
+            pdfstr = pdfrw.objects.pdfstring.PdfString.encode(value)
+        target.update(pdfrw.PdfDict(V=pdfstr, AS=pdfstr))
+        if type(value) == list or not _is_combo_box(target):
+            return True
+        return _set_text_appearances(field.widgets, target, value, acroform)
+    elif field.kind == 'text':
+        target.update(pdfrw.PdfDict(V=value))
+        return _set_text_appearances(field.widgets, target, value, acroform)
+    return False
+
+
+def _copy_pdf_objects(obj, memo):
+    """
+    Copies every dictionary and array reachable from obj. Names, strings and
+    stream data are immutable in pdfrw, so they are shared with the original.
+    memo receives the id() of each original container mapped to its copy.
+    """
+    containers = (pdfrw.PdfDict, pdfrw.PdfArray)
+    pending = [obj]
+    copies = []
+    while pending:
+        original = pending.pop()
+        if id(original) in memo:
+            continue
+        if isinstance(original, pdfrw.PdfDict):
+            copy = pdfrw.PdfDict()
+            for key, value in original.iteritems():
+                dict.__setitem__(copy, key, value)
+            copy._stream = original.stream
+            values = dict.values(copy)
+        else:
+            copy = pdfrw.PdfArray(original)
+            values = list.__iter__(copy)
+        copy.indirect = original.indirect
+        memo[id(original)] = copy
+        copies.append(copy)
+        pending.extend(value for value in values if isinstance(value, containers))
+    for copy in copies:
+        if isinstance(copy, pdfrw.PdfDict):
+            for key, value in dict.items(copy):
+                if isinstance(value, containers):
+                    dict.__setitem__(copy, key, memo[id(value)])
+        else:
+            for index, value in enumerate(list.__iter__(copy)):
+                if isinstance(value, containers):
+                    list.__setitem__(copy, index, memo[id(value)])
+    return memo[id(obj)]
+
+
+class FormTemplate(object):
+    """
+    A fillable pdf that is parsed and indexed once, then filled any number of
+    times without re-reading the source file. write() fills only the fields
+    named in the data_dict and puts them back afterwards, fill() works on a
+    cheap copy of the parsed objects.
+    Parameters
+    ---------
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want to use as a template, or the pdf itself
+        as bytes or a binary file object.
+    Attributes
+    ---------
+    source: str or bytes
+        The input_pdf_path the template was parsed from, file objects are
+        read into bytes.
+    pdf: pdfrw.PdfDict
+        The trailer of the parsed pdf.
+    pages: list
+        The pages of the parsed pdf.
+    fields: OrderedDict
+        Field name to FormField for every field in the pdf.
+    """
+    @measured('FormTemplate')
+    def __init__(self, input_pdf_path):
+        self.source = _pdf_source(input_pdf_path)
+        self.pdf = _open_pdfrw(self.source)
+        self._original = self.source if isinstance(self.source, bytes) else None
+        self._object_offsets = self.pdf.source.obj_offsets
+        self.pages = list(self.pdf.pages)
+        metrics = current_metrics()
+        with metrics.phase('fields'):
+            self.fields = _index_form_fields(self.pages)
+        metrics.count(pages=len(self.pages))
+        self._lock = threading.Lock()
+
+    def clone(self):
+        """
+        Returns a FormTemplate that shares nothing mutable with this one.
+        No parsing or indexing is repeated, the objects are copied and the
+        field index is remapped onto the copies.
+        """
+        memo = {}
+        clone = FormTemplate.__new__(FormTemplate)
+        clone.source = self.source
+        clone._original = self._original
+        clone._object_offsets = self._object_offsets
+        clone._lock = threading.Lock()
+        with self._lock:
+            clone.pdf = _copy_pdf_objects(self.pdf, memo)
+        clone.pages = [memo[id(page)] for page in self.pages]
+        clone.fields = OrderedDict(
+            (name, field._replace(
+                target=memo[id(field.target)],
+                widgets=[memo[id(widget)] for widget in field.widgets]))
+            for name, field in self.fields.items())
+        return clone
+
+    def fill(self, data_dict, flatten=False):
+        """
+        Fills a clone of the template with the dictionary values. Only the
+        fields named in the data_dict are visited.
+        Parameters
+        ---------
+        data_dict: dict
+            The data_dict returned from the function get_form_fields()
+        flatten: bool
+            Default is False meaning it will stay editable. True means the annotations
+            will be uneditable.
+        Returns
+        ---------
+        filled: FormTemplate
+            The filled copy, ready to be saved.
+        """
+        filled = self.clone()
+        filled._fill(convert_dict_values_to_string(data_dict), flatten)
+        return filled
+
+    def _fill(self, data_dict, flatten):
+        """
+        Fills this template in place, jumping straight to the fields named in
+        the already converted data_dict through the field index.
+        """
+        acroform = self.pdf.Root.AcroForm
+        need_appearances = False
+        metrics = current_metrics()
+        fill_start = metrics.clock()
+        for key, value in data_dict.items():
+            field = self.fields.get(key)
+            if field is not None:
+                metrics.count(fields=1)
+                need_appearances |= _fill_form_field(field, value, acroform)
+        metrics.record('fill', fill_start)
+        if flatten == True:
+            for field in self.fields.values():
+                for widget in field.widgets:
+                    widget.update(pdfrw.PdfDict(Ff=make_read_only(field.target["/Ff"])))
+        if need_appearances and acroform is not None:
+            acroform.update(pdfrw.PdfDict(NeedAppearances=pdfrw.PdfObject('true')))
+
+    def _touched_objects(self, data_dict, flatten):
+        """
+        Lists the dictionaries _fill() may modify for the data_dict.
+        """
+        fields = self.fields.values() if flatten == True else \
+            [self.fields[key] for key in data_dict if key in self.fields]
+        touched = [self.pdf.Root.AcroForm] if self.pdf.Root.AcroForm is not None else []
+        for field in fields:
+            touched.append(field.target)
+            touched.extend(field.widgets)
+            touched.extend(field.target[ANNOT_FIELD_KIDS_KEY] or [])
+        return touched
+
+    def save(self, output_pdf_path=None, compress=False):
+        """
+        Writes the pdf to output_pdf_path, a path or file object. None returns
+        the pdf as bytes. compress is the same as in write_fillable_pdf().
+        Waits for a write() on another thread to put the objects back.
+        """
+        with self._lock:
+            return _write_pdfrw(output_pdf_path, self.pdf, compress)
+
+    @measured('FormTemplate.write')
+    def write(self, output_pdf_path, data_dict, flatten=False, as_vector=False, incremental=False, compress=False):
+        """
+        Fills the template and writes it to output_pdf_path. Same arguments as
+        write_fillable_pdf() without the input path. Instead of cloning, the
+        fields named in the data_dict are filled in place and restored once the
+        pdf is written, so the cost of the fill depends on the number of keys
+        supplied and not on the size of the form.
+        """
+        data_dict = convert_dict_values_to_string(data_dict)
+        bake = flatten == True and as_vector == True
+        incremental = incremental == True and not bake
+        metrics = current_metrics()
+        with self._filled(data_dict, flatten) as saved:
+            update = None
+            if incremental:
+                with metrics.phase('serialize'):
+                    update = self._incremental_update(saved)
+            if update is None:
+                filled = _write_pdfrw(None if bake else output_pdf_path, self.pdf, compress and not bake)
+        if update is not None:
+            with metrics.phase('serialize'):
+                return _write_incremental(output_pdf_path, self._original, update)
+        if bake:
+            return _bake_pdf(filled, output_pdf_path, compress)
+        return filled
+
+    @contextlib.contextmanager
+    def _filled(self, data_dict, flatten):
+        """
+        Fills the template in place with the already converted data_dict for
+        the duration of the with block, then puts back every object the fill
+        may have changed. Yields the (object, items) saved before the fill.
+        """
+        with self._lock:
+            saved = dict((id(obj), (obj, dict.copy(obj))) for obj in self._touched_objects(data_dict, flatten))
+            try:
+                self._fill(data_dict, flatten)
+                yield saved.values()
+            finally:
+                for obj, items in saved.values():
+                    dict.clear(obj)
+                    dict.update(obj, items)
+
+    def _incremental_update(self, saved):
+        """
+        Serializes the objects _fill() changed, given the (object, items) saved
+        before the fill, as an incremental update of the original bytes.
+        Returns None when the pdf has to be written again in full.
+        """
+        changed = []
+        for obj, items in saved:
+            if len(obj) == len(items) and all(items.get(key) is value for key, value in dict.items(obj)):
+                continue
+            if obj is self.pdf.Root.AcroForm and not obj.indirect:
+                # A direct /AcroForm is written as part of the catalog
+                obj = self.pdf.Root
+            changed.append(obj)
+        if self._original is None:
+            with open(self.source, 'rb') as source:
+                self._original = source.read()
+        return incremental.incremental_update(self._original, self.pdf, changed, self._object_offsets)
+
+
+def _write_incremental(output_pdf_path, original, update):
+    """
+    Writes the original bytes followed by an incremental update to a path or
+    file object, or returns them as bytes when output_pdf_path is None.
+    """
+    metrics = current_metrics()
+    if metrics.enabled:
+        metrics.counts['bytes_written'] = len(original) + len(update)
+    if output_pdf_path is None:
+        return original + update
+    if isinstance(output_pdf_path, (str, os.PathLike)):
+        with open(output_pdf_path, 'wb') as output:
+            output.write(original)
+            output.write(update)
+    else:
+        output_pdf_path.write(original)
+        output_pdf_path.write(update)
+
+
+RecordError = namedtuple('RecordError', ['index', 'field', 'value', 'message'])
+RecordError.__doc__ = """
+A value of a record that does not fit the form, found by FormValidator.
+index is the position of the record, field the key and value the value
+that was rejected.
+"""
+
+
+class RecordValidationError(ValueError):
+    """
+    Raised by FormValidator.check() when records don't fit the form, before
+    any of them is filled. errors holds a RecordError for every problem.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [f"record {error.index}: {error.message}" for error in errors[:10]]
+        if len(errors) > 10:
+            lines.append(f"... and {len(errors) - 10} more")
+        super().__init__(f"{len(errors)} invalid values\n" + "\n".join(lines))
+
+
+EMPTY_VALUES = frozenset(['', 'None'])  # values that leave a radio, combo or checkbox unchanged
+
+
+class FormValidator(object):
+    """
+    Checks records against the schema of a form before any pdf work starts,
+    so a batch reports all its bad values at once instead of failing half
+    way. The schema is compiled once into the allowed values and length of
+    every field, then each value is a single set or length lookup.
+    Values are converted with convert_dict_values_to_string() first, like
+    write_fillable_pdf() does.
+    Parameters
+    ---------
+    template: str, bytes, file, FormTemplate or dict
+        Path to the pdf the records are for, the pdf itself, a FormTemplate
+        or a schema returned by get_form_schema().
+    unknown_keys: bool
+        Default is True meaning keys that are not fields of the form are
+        errors. False ignores them, like write_fillable_pdf() does.
+    Attributes
+    ---------
+    schema: dict
+        Field name to FieldSchema.
+    """
+    def __init__(self, template, unknown_keys=True):
+        if isinstance(template, dict):
+            self.schema = template
+        elif isinstance(template, FormTemplate):
+            self.schema = _form_schema(template.pdf)
+        else:
+            # Validating must not leave a schema cache next to the caller's pdf
+            self.schema = get_form_schema(template, cache=False)
+        self.unknown_keys = unknown_keys
+        self._rules = {name: self._compile(field) for name, field in self.schema.items()}
+
+    @staticmethod
+    def _compile(field):
+        """
+        Returns (kind, allowed values or None, max length or None) of a field.
+        """
+        if field.kind in ('radio', 'combo'):
+            return field.kind, frozenset(field.options or ()) | EMPTY_VALUES, None
+        if field.kind == 'checkbox' and field.export_states:
+            return field.kind, frozenset(field.export_states) | {'Off'} | EMPTY_VALUES, None
+        if field.kind == 'text':
+            return field.kind, None, field.max_length
+        return field.kind, None, None
+
+    def iter_errors(self, records):
+        """
+        Yields a RecordError for every bad value of records, in order.
+        """
+        rules = self._rules
+        for index, data_dict in enumerate(records):
+            for key, value in convert_dict_values_to_string(data_dict).items():
+                rule = rules.get(key)
+                if rule is None:
+                    if self.unknown_keys:
+                        yield RecordError(index, key, value, f"{key} Is Not A Field Of The Form")
+                    continue
+                kind, allowed, max_length = rule
+                if allowed is not None:
+                    if type(value) == list:
+                        if kind == 'combo':
+                            wrong = [each for each in value if each not in allowed]
+                            if wrong:
+                                yield RecordError(index, key, value, f"{wrong} Not Options For {key}, Options are {self.schema[key].options}")
+                        continue
+                    if value in allowed:
+                        continue
+                    if kind == 'radio':
+                        yield RecordError(index, key, value, f"{value} Not An Option, Options are {self.schema[key].options}")
+                    elif kind == 'combo':
+                        yield RecordError(index, key, value, f"{value} Not An Option For {key}, Options are {self.schema[key].options}")
+                    else:
+                        yield RecordError(index, key, value, f"{value} Not A State Of {key}, States are {self.schema[key].export_states + ['Off']}")
+                elif max_length is not None and type(value) != list and len(value) > max_length:
+                    yield RecordError(index, key, value, f"{key} Is Longer Than {max_length} Characters")
 
+    def validate(self, records):
+        """
+        Returns the list of RecordError of records, empty when all fit.
+        """
+        return list(self.iter_errors(records))
 
+    def check(self, records):
+        """
+        Raises a RecordValidationError listing every bad value of records.
+        """
+        errors = self.validate(records)
+        if errors:
+            raise RecordValidationError(errors)
+
+
+def validate_records(template, records, unknown_keys=True):
+    """
+    Checks records against a form before filling them, see FormValidator.
+    Parameters
+    ---------
+    template: str, bytes, file, FormTemplate or dict
+        Path to the pdf the records are for, the pdf itself, a FormTemplate
+        or a schema returned by get_form_schema().
+    records: iterable
+        The data_dicts to check.
+    unknown_keys: bool
+        Default is True meaning keys that are not fields are errors.
+    Returns
+    ---------
+    errors: list
+        A RecordError(index, field, value, message) for every bad value.
+    """
+    return FormValidator(template, unknown_keys).validate(records)
+
+
+BatchResult = namedtuple('BatchResult', ['index', 'output_pdf_path', 'error'])
+BatchResult.__doc__ = """
+The outcome of one record of write_fillable_pdf_batch(). error is None when
+the record was written, otherwise the exception it raised.
+"""
+
+_batch_template = None
+
+
+def _init_batch_worker(source):
+    """
+    Runs once in every worker process and parses the template for all the
+    records that worker will fill.
+    """
+    global _batch_template
+    _batch_template = FormTemplate(source)
+
+
+def _fill_batch_record(index, data_dict, output_path_pattern, flatten, as_vector, incremental=False, compress=False, template=None):
+    """
+    Fills a single record of a batch. Errors are returned rather than raised so
+    one bad record does not abort the batch.
+    """
+    output_pdf_path = None
+    if isinstance(data_dict, Exception):
+        return BatchResult(index, output_pdf_path, data_dict)
+    try:
+        output_pdf_path = output_path_pattern.format(index=index, record=data_dict)
+        (template or _batch_template).write(output_pdf_path, data_dict, flatten, as_vector, incremental, compress)
+    except Exception as error:
+        return BatchResult(index, output_pdf_path, error)
+    return BatchResult(index, output_pdf_path, None)
+
+
+def write_fillable_pdf_batch(template, records, output_path_pattern, workers=None, flatten=False, ordered=True, as_vector=False, incremental=False, compress=False, validate=False):
+    """
+    Fills one pdf per record using a pool of worker processes. Every worker
+    parses the template once and then fills the records it is handed. Records
+    are read lazily and only a few per worker are in flight at a time, so
+    records can be a generator of any length. This is a generator, nothing is
+    written until it is iterated.
+    Parameters
+    ---------
+    template: str or FormTemplate
+        Path to the pdf you want to fill, or a FormTemplate.
+    records: iterable
+        The data_dicts to write, one output pdf each. An exception in place of
+        a data_dict, i.e. a record that could not be read, is yielded as that
+        record's error.
+    output_path_pattern: str
+        Format string for the output paths. {index} is the position of the
+        record and {record} the data_dict, i.e. 'out/{index}.pdf' or
+        'out/{record[Name]}.pdf'.
+    workers: int
+        Number of worker processes, defaults to the number of cpus. 1 fills
+        the records in the current process.
+    flatten: bool
+        Default is False meaning it will stay editable. True means the annotations
+        will be uneditable.
+    ordered: bool
+        Default is True meaning results are yielded in the order of records.
+        False yields each result as soon as it is finished.
+    as_vector: bool
+        Default is False. With flatten, True merges each field's appearance into
+        the page content and removes the fields.
+    incremental: bool
+        Default is False. True writes each pdf as the template bytes followed
+        by an incremental update, see write_fillable_pdf().
+    compress: bool
+        Default is False. True writes compressed pdfs, see write_fillable_pdf().
+    validate: bool
+        Default is False. True reads all the records first and checks them
+        with FormValidator, raising a RecordValidationError with every bad
+        value before any pdf is written.
+    Returns
+    ---------
+    Yields a BatchResult(index, output_pdf_path, error) for each record.
+    """
+    if validate == True:
+        records = list(records)
+        FormValidator(template).check(records)
+    if workers == 1:
+        if not isinstance(template, FormTemplate):
+            template = FormTemplate(template)
+        for index, data_dict in enumerate(records):
+            yield _fill_batch_record(index, data_dict, output_path_pattern, flatten, as_vector, incremental, compress, template)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    source = template.source if isinstance(template, FormTemplate) else template
+    with futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(source,)) as executor:
+        pending = []
+        for index, data_dict in enumerate(records):
+            pending.append(executor.submit(_fill_batch_record, index, data_dict, output_path_pattern, flatten, as_vector, incremental, compress))
+            yield from _collect_batch_results(pending, ordered, workers * 4)
+        yield from _collect_batch_results(pending, ordered, 0)
+
+
+def _collect_batch_results(pending, ordered, keep):
+    """
+    Yields finished results until no more than keep futures are pending.
+    """
+    while len(pending) > keep:
+        if ordered:
+            yield pending.pop(0).result()
+        else:
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield future.result()
+
+
+FieldsResult = namedtuple('FieldsResult', ['index', 'input_pdf_path', 'fields', 'error'])
+FieldsResult.__doc__ = """
+The fields of one pdf of get_form_fields_batch(). fields is the dictionary
+get_form_fields() returned and error None, or fields is None and error the
+exception the pdf raised.
+"""
+
+
+def _get_batch_fields(index, input_pdf_path, engine):
+    """
+    Reads the fields of a single pdf of a batch. Errors are returned rather
+    than raised so one broken pdf does not abort the batch.
+    """
+    try:
+        return FieldsResult(index, input_pdf_path, get_form_fields(input_pdf_path, engine=engine), None)
+    except Exception as error:
+        return FieldsResult(index, input_pdf_path, None, error)
+
+
+def get_form_fields_batch(input_pdf_paths, workers=None, ordered=True, engine='pdfrw'):
+    """
+    Reads the form fields of many pdfs on a pool of worker processes. Paths
+    are read lazily and only a few per worker are in flight at a time, so
+    input_pdf_paths can be a generator over any number of files. This is a
+    generator, nothing is read until it is iterated.
+    Parameters
+    ---------
+    input_pdf_paths: iterable
+        Paths of the pdfs you want the fields from.
+    workers: int
+        Number of worker processes, defaults to the number of cpus. 1 reads
+        the pdfs in the current process.
+    ordered: bool
+        Default is True meaning results are yielded in the order of
+        input_pdf_paths. False yields each result as soon as it is finished.
+    engine: str
+        Default is 'pdfrw', see get_form_fields().
+    Returns
+    ---------
+    Yields a FieldsResult(index, input_pdf_path, fields, error) for each pdf.
+    """
+    _check_engine(engine)
+    if workers == 1:
+        for index, input_pdf_path in enumerate(input_pdf_paths):
+            yield _get_batch_fields(index, input_pdf_path, engine)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for index, input_pdf_path in enumerate(input_pdf_paths):
+            pending.append(executor.submit(_get_batch_fields, index, input_pdf_path, engine))
+            yield from _collect_batch_results(pending, ordered, workers * 4)
+        yield from _collect_batch_results(pending, ordered, 0)
+
+
+IndexUpdate = namedtuple('IndexUpdate', ['parsed', 'unchanged', 'copied', 'failed'])
+IndexUpdate.__doc__ = """
+What ExtractionIndex.update() did: the number of pdfs parsed, served
+unchanged from the index, copied from an indexed pdf with the same content,
+and that could not be read.
+"""
+
+
+def _file_sha256(path):
+    """
+    Returns the sha256 of a file, read a megabyte at a time.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionIndex(object):
+    """
+    An SQLite database of the fields get_form_fields() extracted from many
+    pdfs, so a repeated extraction only parses the pdfs that are new or
+    changed. Each pdf is stored with its size, modification time and sha256:
+    a pdf whose size and mtime are unchanged is served from the index
+    without being read, one whose content hash is unchanged (i.e. it was
+    only touched) is served after hashing, and one with the content of
+    another indexed pdf (i.e. a copy or a move) gets that pdf's fields.
+    Pdfs that could not be read are tried again on every update.
+    Used as a context manager, the database is closed when the block exits.
+    Parameters
+    ---------
+    database_path: str
+        Path of the SQLite file, created when it does not exist.
+    engine: str
+        Default is 'pdfrw', see get_form_fields().
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, error TEXT);
+        CREATE INDEX IF NOT EXISTS documents_by_sha256 ON documents (sha256);
+        CREATE TABLE IF NOT EXISTS fields (
+            path TEXT REFERENCES documents (path) ON DELETE CASCADE, name TEXT, value TEXT,
+            PRIMARY KEY (path, name));
+        CREATE INDEX IF NOT EXISTS fields_by_name ON fields (name, value);
+        """
+    COMMIT_EVERY = 500                   # pdfs stored per transaction
+
+    def __init__(self, database_path, engine='pdfrw'):
+        _check_engine(engine)
+        self.database_path = database_path
+        self.engine = engine
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Commits and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+    def _fields(self, path):
+        """
+        Returns the stored fields of path, in the order they were extracted.
+        """
+        rows = self.connection.execute('SELECT name, value FROM fields WHERE path = ? ORDER BY rowid', (path,))
+        return {name: json.loads(value) for name, value in rows}
+
+    def _store(self, path, stat, digest, fields, error):
+        """
+        Replaces the row and fields of path.
+        """
+        self.connection.execute('DELETE FROM documents WHERE path = ?', (path,))
+        self.connection.execute('INSERT INTO documents VALUES (?, ?, ?, ?, ?)',
+                                (path, stat.st_size, stat.st_mtime_ns, digest, None if error is None else repr(error)))
+        if fields is not None:
+            self.connection.executemany('INSERT INTO fields VALUES (?, ?, ?)',
+                                        ((path, name, json.dumps(value)) for name, value in fields.items()))
+
+    def extract(self, input_pdf_paths, workers=1):
+        """
+        Brings the index up to date with input_pdf_paths and yields the fields
+        of every pdf, from the index when it is unchanged. Only the pdfs to
+        parse are kept in memory until they are parsed, with workers processes
+        like get_form_fields_batch(). This is a generator, nothing is done
+        until it is iterated.
+        Parameters
+        ---------
+        input_pdf_paths: iterable
+            Paths of the pdfs, stored as absolute paths.
+        workers: int
+            Number of worker processes parsing the new and changed pdfs.
+        Returns
+        ---------
+        Yields a FieldsResult(index, input_pdf_path, fields, error) for each
+        pdf, unchanged ones first.
+        """
+        yield from self._extract(input_pdf_paths, workers, {})
+
+    def _extract(self, input_pdf_paths, workers, counts):
+        """
+        extract(), adding to counts how each pdf was served.
+        """
+        stale = OrderedDict()
+        stored = 0
+        for index, path in enumerate(input_pdf_paths):
+            path = os.path.abspath(path)
+            if path in stale:
+                # a repeated path is parsed once and yielded at each position
+                stale[path][0].append(index)
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError as error:
+                counts['failed'] = counts.get('failed', 0) + 1
+                yield FieldsResult(index, path, None, error)
+                continue
+            row = self.connection.execute(
+                'SELECT size, mtime_ns, sha256, error FROM documents WHERE path = ?', (path,)).fetchone()
+            if row is not None and row[3] is None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+                counts['unchanged'] = counts.get('unchanged', 0) + 1
+                yield FieldsResult(index, path, self._fields(path), None)
+                continue
+            try:
+                digest = _file_sha256(path)
+            except OSError as error:
+                counts['failed'] = counts.get('failed', 0) + 1
+                yield FieldsResult(index, path, None, error)
+                continue
+            if row is not None and row[3] is None and row[2] == digest:
+                # touched but not changed, only the stat is stored again
+                self.connection.execute('UPDATE documents SET size = ?, mtime_ns = ? WHERE path = ?',
+                                        (stat.st_size, stat.st_mtime_ns, path))
+                counts['unchanged'] = counts.get('unchanged', 0) + 1
+                yield FieldsResult(index, path, self._fields(path), None)
+                continue
+            same = self.connection.execute(
+                'SELECT path FROM documents WHERE sha256 = ? AND error IS NULL AND path != ? LIMIT 1',
+                (digest, path)).fetchone()
+            if same is not None:
+                fields = self._fields(same[0])
+                self._store(path, stat, digest, fields, None)
+                counts['copied'] = counts.get('copied', 0) + 1
+                yield FieldsResult(index, path, fields, None)
+                continue
+            stale[path] = ([index], stat, digest)
+
+        for result in get_form_fields_batch(stale, workers=workers, ordered=False, engine=self.engine):
+            indexes, stat, digest = stale[result.input_pdf_path]
+            self._store(result.input_pdf_path, stat, digest, result.fields, result.error)
+            outcome = 'parsed' if result.error is None else 'failed'
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if len(indexes) > 1:
+                repeat = 'unchanged' if result.error is None else 'failed'
+                counts[repeat] = counts.get(repeat, 0) + len(indexes) - 1
+            stored += 1
+            if stored % self.COMMIT_EVERY == 0:
+                self.connection.commit()
+            for index in indexes:
+                yield result._replace(index=index)
+        self.connection.commit()
+
+    def update(self, input_pdf_paths, workers=1):
+        """
+        Brings the index up to date with input_pdf_paths, parsing only the
+        new and changed pdfs, see extract().
+        Returns
+        ---------
+        An IndexUpdate(parsed, unchanged, copied, failed) of the counts.
+        """
+        counts = {}
+        for _ in self._extract(input_pdf_paths, workers, counts):
+            pass
+        return IndexUpdate(*(counts.get(name, 0) for name in IndexUpdate._fields))
+
+    def remove_missing(self):
+        """
+        Removes the pdfs that no longer exist from the index. Returns how
+        many were removed.
+        """
+        missing = [path for path, in self.connection.execute('SELECT path FROM documents')
+                   if not os.path.exists(path)]
+        self.connection.executemany('DELETE FROM documents WHERE path = ?', ((path,) for path in missing))
+        self.connection.commit()
+        return len(missing)
+
+    def get(self, path):
+        """
+        Returns the fields stored for a pdf, None when it is not indexed or
+        could not be read.
+        """
+        path = os.path.abspath(path)
+        row = self.connection.execute('SELECT error FROM documents WHERE path = ?', (path,)).fetchone()
+        if row is None or row[0] is not None:
+            return None
+        return self._fields(path)
+
+    def values(self, field_name):
+        """
+        Yields (path, value) of a field for every indexed pdf that has it.
+        """
+        rows = self.connection.execute('SELECT path, value FROM fields WHERE name = ? ORDER BY path', (field_name,))
+        for path, value in rows:
+            yield path, json.loads(value)
+
+    def find(self, field_name, value):
+        """
+        Yields the paths of the indexed pdfs where the field has value, i.e.
+        find('Country Combo Box', 'Germany').
+        """
+        rows = self.connection.execute('SELECT path FROM fields WHERE name = ? AND value = ? ORDER BY path',
+                                       (field_name, json.dumps(value)))
+        for path, in rows:
+            yield path
+
+    def field_names(self):
+        """
+        Returns a dictionary of every field name in the index to the number
+        of pdfs that have it.
+        """
+        return dict(self.connection.execute('SELECT name, COUNT(*) FROM fields GROUP BY name ORDER BY name'))
+
+    def errors(self):
+        """
+        Yields (path, error) of the indexed pdfs that could not be read.
+        """
+        yield from self.connection.execute('SELECT path, error FROM documents WHERE error IS NOT NULL ORDER BY path')
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def __contains__(self, path):
+        return self.connection.execute(
+            'SELECT 1 FROM documents WHERE path = ?', (os.path.abspath(path),)).fetchone() is not None
+
+
+def _copy_direct(obj):
+    """
+    Copies a dictionary or array together with the direct dictionaries and
+    arrays inside it. Indirect objects stay shared with the original.
+    """
+    if isinstance(obj, pdfrw.PdfDict):
+        copy = pdfrw.PdfDict()
+        for key, value in dict.items(obj):
+            if isinstance(value, (pdfrw.PdfDict, pdfrw.PdfArray)) and not value.indirect:
+                value = _copy_direct(value)
+            dict.__setitem__(copy, key, value)
+        copy._stream = obj.stream
+    else:
+        copy = pdfrw.PdfArray(
+            _copy_direct(value) if isinstance(value, (pdfrw.PdfDict, pdfrw.PdfArray)) and not value.indirect else value
+            for value in list.__iter__(obj))
+    copy.indirect = obj.indirect
+    return copy
+
+
+def _copy_form_pages(pages, record_field):
+    """
+    Copies the pages of a filled template along with their annotations and the
+    fields of their widgets. Contents, resources, fonts and appearance streams
+    stay shared with the template, so they are written once however many
+    copies are made. The top level fields become kids of record_field, which
+    prefixes every field name with the name of the record.
+    Returns
+    ---------
+    page_copies: list
+        The copied pages, in order.
+    """
+    copies = {}
+    top_fields = set()
+
+    def copy_of(obj):
+        if id(obj) not in copies:
+            copies[id(obj)] = _copy_direct(obj)
+            copies[id(obj)].indirect = True
+        return copies[id(obj)]
+
+    for page in pages:
+        page_copy = copy_of(page)
+        # Inherited attributes have to move onto the page, like PdfWriter.addpage()
+        inheritable = page.inheritable
+        page_copy.update(pdfrw.PdfDict(
+            Resources=inheritable.Resources, MediaBox=inheritable.MediaBox,
+            CropBox=inheritable.CropBox, Rotate=inheritable.Rotate))
+        annotations = page[ANNOT_KEY] or []
+        if annotations:
+            page_copy.Annots = pdfrw.PdfArray(copy_of(annotation) for annotation in annotations)
+        for annotation in annotations:
+            if annotation[SUBTYPE_KEY] != WIDGET_SUBTYPE_KEY:
+                continue
+            field = annotation
+            while field[ANNOT_FIELD_PARENT_KEY] is not None:
+                field = field[ANNOT_FIELD_PARENT_KEY]
+                copy_of(field)
+            if field[ANNOT_FIELD_KEY] and id(field) not in top_fields:
+                top_fields.add(id(field))
+                copy_of(field).Parent = record_field
+                record_field.Kids.append(copy_of(field))
+    page_copies = [copies[id(page)] for page in pages]
+
+    # Point the copies at each other instead of at the template
+    for copy in copies.values():
+        for key in (pdfrw.PdfName.P, pdfrw.PdfName.Parent, pdfrw.PdfName.Popup, pdfrw.PdfName.IRT):
+            value = copy[key]
+            if value is not None and id(value) in copies:
+                copy[key] = copies[id(value)]
+        if copy[ANNOT_FIELD_KIDS_KEY]:
+            copy.Kids = pdfrw.PdfArray(
+                copies[id(kid)] for kid in copy[ANNOT_FIELD_KIDS_KEY] if id(kid) in copies)
+        destination = copy.Dest
+        if isinstance(destination, pdfrw.PdfArray) and not destination.indirect and destination and id(destination[0]) in copies:
+            destination[0] = copies[id(destination[0])]
+    return page_copies
+
+
+def write_fillable_pdf_merged(template, records, output_pdf_path, field_prefix='record{index}', flatten=False, as_vector=False, compress=False, validate=False):
+    """
+    Fills the template once per record and writes all the filled copies,
+    one after the other, into a single pdf. The copies share the template's
+    page contents, fonts and other resources, so each record only adds its
+    pages, fields and appearance streams. The fields of every copy are
+    renamed under a parent field so the records don't collide. The merged
+    pdf is built in memory and written at the end, so memory grows with the
+    number of records. For runs too large for that, fill the records with
+    write_fillable_pdf_batch() instead.
+    Parameters
+    ---------
+    template: str, bytes, file or FormTemplate
+        Path to the pdf you want to fill, the pdf itself, or a FormTemplate.
+    records: iterable
+        The data_dicts to write, one copy of the template each.
+    output_pdf_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
+    field_prefix: str
+        Format string for the name of each record's parent field. {index} is
+        the position of the record and {record} the data_dict. A field 'Name'
+        of the first record becomes 'record0.Name' by default.
+    flatten: bool
+        Default is False meaning it will stay editable. True means the annotations
+        will be uneditable.
+    as_vector: bool
+        Default is False. With flatten, True merges each field's appearance into
+        the page content and removes the fields.
+    compress: bool
+        Default is False. True writes a compressed pdf, see write_fillable_pdf().
+    validate: bool
+        Default is False. True checks all the records with FormValidator
+        first, raising a RecordValidationError with every bad value before
+        any record is filled.
+    Returns
+    ---------
+    The pdf as bytes when output_pdf_path is None.
+    """
+    if not isinstance(template, FormTemplate):
+        template = FormTemplate(template)
+    if validate == True:
+        records = list(records)
+        FormValidator(template).check(records)
+    acroform = template.pdf.Root.AcroForm
+    pages = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Pages, Kids=pdfrw.PdfArray())
+    fields = pdfrw.PdfArray()
+    need_appearances = False
+    for index, data_dict in enumerate(records):
+        record_field = pdfrw.IndirectPdfDict(
+            T=pdfrw.PdfString.encode(field_prefix.format(index=index, record=data_dict)), Kids=pdfrw.PdfArray())
+        with template._filled(convert_dict_values_to_string(data_dict), flatten):
+            page_copies = _copy_form_pages(template.pages, record_field)
+            need_appearances = need_appearances or (acroform is not None and acroform.NeedAppearances == 'true')
+        for page_copy in page_copies:
+            page_copy.Parent = pages
+            pages.Kids.append(page_copy)
+        fields.append(record_field)
+    pages.Count = len(pages.Kids)
+
+    merged_acroform = pdfrw.IndirectPdfDict(Fields=fields)
+    if acroform is not None:
+        merged_acroform.update(pdfrw.PdfDict(DA=acroform.DA, DR=acroform.DR, Q=acroform.Q))
+    if need_appearances:
+        merged_acroform.NeedAppearances = pdfrw.PdfObject('true')
+    trailer = pdfrw.PdfDict(Root=pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Catalog, Pages=pages, AcroForm=merged_acroform))
+    if flatten == True and as_vector == True:
+        return _bake_pdf(_write_pdfrw(None, trailer), output_pdf_path, compress)
+    return _write_pdfrw(output_pdf_path, trailer, compress)
+
+
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024   # size bound of the place_image cache
+
+_image_cache = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()
+
+
+def _image_cache_key(image):
+    """
+    Identifies an image source, by content for bytes and by path, size and
+    modification time for files, so an edited file is not served stale.
+    """
+    if isinstance(image, bytes):
+        return ('bytes', hashlib.sha1(image).hexdigest())
+    stat = os.stat(image)
+    return ('path', os.path.abspath(image), stat.st_size, stat.st_mtime_ns)
+
+
+def _image_pdf(file_name):
+    """
+    Returns a one page fitz document showing the image. The image is decoded
+    and embedded once, then the document is kept in a least recently used
+    cache bounded by IMAGE_CACHE_MAX_BYTES, so placing it again only copies
+    the embedded image.
+    """
+    global _image_cache_bytes
+    image = _pdf_source(file_name)
+    key = _image_cache_key(image)
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return _image_cache[key][0]
+
+    with Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) as opened:
+        width, height = opened.size
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    if isinstance(image, bytes):
+        page.insert_image(page.rect, stream=image)
+    else:
+        page.insert_image(page.rect, filename=image)
+    data = doc.tobytes()
+    doc = fitz.open(stream=data, filetype='pdf')
+
+    with _image_cache_lock:
+        if key not in _image_cache:
+            _image_cache[key] = (doc, len(data))
+            _image_cache_bytes += len(data)
+            while _image_cache_bytes > IMAGE_CACHE_MAX_BYTES and len(_image_cache) > 1:
+                _, (_, size) = _image_cache.popitem(last=False)
+                _image_cache_bytes -= size
+        return _image_cache[key][0]
+
+
+def _pdf_name(value):
+    """
+    Encodes a str as a pdf name, i.e. 'Ja Nein' as '/Ja#20Nein'.
+    """
+    return '/' + ''.join(chr(byte) if 0x21 <= byte <= 0x7e and chr(byte) not in '#()<>[]{}/%' else '#%02X' % byte
+                         for byte in value.encode('utf-8'))
+
+
+def _fill_fitz_button(doc, states, value):
+    """
+    Writes a checkbox or radio group value with fitz for PdfEditor.fill().
+    states holds the (xref, on state) of each widget of the field. Widgets
+    without their own /T are the kids of a radio group, like in
+    _fill_form_field().
+    """
+    if value == "None" or value == "":
+        return
+    if doc.xref_get_key(states[0][0], 'T')[0] != 'null':
+        # button field i.e. a checkbox
+        for xref, _ in states:
+            doc.xref_set_key(xref, 'V', _pdf_name(value))
+            doc.xref_set_key(xref, 'AS', _pdf_name(value))
+        return
+    options = [state for _, state in states if state]
+    if value not in options:
+        raise KeyError(f"{value} Not An Option, Options are {options}")
+    for xref, state in states:
+        doc.xref_set_key(xref, 'AS', _pdf_name(value if state == value else 'Off'))
+    parents = {doc.xref_get_key(xref, 'Parent')[1] for xref, _ in states}
+    for parent in parents:
+        doc.xref_set_key(int(parent.split()[0]), 'V', _pdf_name(value))
+
+
+def _editor_step(method):
+    """
+    Reports a PdfEditor method as a phase named after it.
+    """
+    @functools.wraps(method)
+    def step(self, *args, **kwargs):
+        with self._reporting(), current_metrics().phase(method.__name__):
+            return method(self, *args, **kwargs)
+    return step
+
+
+class PdfEditor(object):
+    """
+    Opens a pdf once with fitz so any number of placements and page
+    operations can be applied before it is saved once. The methods take the
+    same arguments as the functions of the same name, without the input
+    and output paths. Used as a context manager, the pdf is saved when the
+    block exits without an exception.
+    Parameters
+    ---------
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want to edit, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None keeps the pdf as bytes
+        in result.
+    incremental: bool
+        Default is False meaning the whole pdf is rewritten. True appends only
+        the changed objects to the original bytes as an incremental update,
+        in place when output_map_path is input_pdf_path, otherwise to a copy.
+    kwargs: Dict
+        Additional arguments to pass to fitz save method.
+    Attributes
+    ---------
+    doc: fitz.Document
+        The open document.
+    result: bytes or None
+        The pdf as bytes once saved, when output_map_path is None.
+    """
+    def __init__(self, input_pdf_path, output_map_path=None, incremental=False, **kwargs):
+        self.output_map_path = output_map_path
+        self.incremental = incremental
+        self.save_kwargs = kwargs
+        self.result = None
+        self._temp_path = None
+        self._copy_path = None
+        # Keeps the cached images shown in this document alive until it is saved
+        self._images = {}
+        # An editor created outside any operation reports as its own 'PdfEditor'
+        # operation, handed to the metrics sink when it is closed.
+        self._metrics = start_operation('PdfEditor')
+        self._error = None
+        with self._reporting():
+            self.doc = self._open(input_pdf_path)
+
+    def _open(self, input_pdf_path):
+        """
+        Opens the document, from a copy at its final place when incremental.
+        """
+        if not self.incremental:
+            return _open_fitz(input_pdf_path)
+
+        # fitz can only append an update to the file the document was opened
+        # from, so the original bytes are first copied to where they will end.
+        output_map_path = self.output_map_path
+        source = _pdf_source(input_pdf_path)
+        if isinstance(output_map_path, (str, os.PathLike)):
+            work_path = output_map_path
+        else:
+            handle, work_path = tempfile.mkstemp(suffix='.pdf')
+            os.close(handle)
+            self._temp_path = work_path
+        in_place = not isinstance(source, bytes) and os.path.exists(work_path) and os.path.samefile(source, work_path)
+        if isinstance(source, bytes):
+            with open(work_path, 'wb') as work_file:
+                work_file.write(source)
+        elif not in_place:
+            shutil.copyfile(source, work_path)
+        if not in_place and self._temp_path is None:
+            self._copy_path = work_path
+        return _open_fitz(work_path)
+
+    def _reporting(self):
+        """
+        Makes the editor's own metrics the current ones, when it has any.
+        """
+        return active(self._metrics) if self._metrics is not None else contextlib.nullcontext()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._error = exc_value
+        try:
+            if exc_type is None:
+                self.save()
+        finally:
+            self.close()
+
+    def save(self):
+        """
+        Saves the pdf to output_map_path. Returns the pdf as bytes when
+        output_map_path is None.
+        """
+        with self._reporting():
+            return self._save()
+
+    def _save(self):
+        if not self.incremental:
+            self.result = _save_fitz(self.doc, self.output_map_path, **self.save_kwargs)
+            return self.result
+        metrics = current_metrics()
+        work_path = self.doc.name
+        with metrics.phase('serialize'):
+            if not self.doc.can_save_incrementally():
+                # i.e. a repaired pdf, the whole file has to be rewritten
+                data = self.doc.tobytes(**self.save_kwargs)
+                self.doc.close()
+                with open(work_path, 'wb') as work_file:
+                    work_file.write(data)
+            else:
+                self.doc.save(work_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **self.save_kwargs)
+        _count_written(metrics, work_path)
+        self._copy_path = None
+        if self._temp_path is not None:
+            with open(self._temp_path, 'rb') as work_file:
+                data = work_file.read()
+            if self.output_map_path is None:
+                self.result = data
+            else:
+                self.output_map_path.write(data)
+        return self.result
+
+    def close(self):
+        """
+        Closes the document without saving it.
+        """
+        if not self.doc.is_closed:
+            self.doc.close()
+        # A copy of the original that never received its update is removed
+        for path in (self._temp_path, self._copy_path):
+            if path is not None:
+                os.remove(path)
+        self._temp_path = self._copy_path = None
+        if self._metrics is not None:
+            metrics, self._metrics = self._metrics, None
+            finish_operation(metrics, self._error)
+
+    @_editor_step
+    def rotate_page(self, deg, page_number):
+        """
+        Rotate a page, see rotate_page().
+        """
+        page = self.doc[page_number-1]
+        page.set_rotation(deg)
+
+    @_editor_step
+    def place_radiobutton(self, field_name, x, y, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0)):
+        """
+        Place a radio box, see place_radiobutton().
+        """
+        page = self.doc[page_number-1]
+
+        widget = fitz.Widget()
+        widget.rect = fitz.Rect(x, y, x+width, y+height)
+        widget.field_type = fitz.PDF_WIDGET_TYPE_RADIOBUTTON
+        # Placed off, fitz looks up the other buttons of the group before
+        # switching one on, which fails for a widget not added yet.
+        widget.field_value = False
+        widget.text_fontsize = 12
+        widget.text_color = font_color
+        widget.text_font = font_name
+        widget.fill_color = fill_color
+        widget.field_name = field_name
+
+        page.add_widget(widget)
+
+    @_editor_step
+    def place_dropdown(self, field_name, values, x, y, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0)):
+        """
+        Place a dropdown box widget, see place_dropdown().
+        """
+        page = self.doc[page_number-1]
+        widget = fitz.Widget()
+        widget.field_name = field_name
+        widget.field_label = "Drop Down"
+        widget.fill_color = fill_color
+        widget.text_color = font_color
+        widget.field_type = fitz.PDF_WIDGET_TYPE_LISTBOX
+        widget.field_flags = fitz.PDF_CH_FIELD_IS_COMMIT_ON_SEL_CHANGE
+        widget.choice_values = values
+        widget.rect = fitz.Rect(x, y, x+width, y+height)
+        widget.text_fontsize = font_size
+        widget.field_value = widget.choice_values[-1]
+        page.add_widget(widget)
+
+    @_editor_step
+    def place_text_box(self, field_name, prefilled_text, x, y, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0)):
+        """
+        Place a fillable text box widget, see place_text_box().
+        """
+        page = self.doc[page_number-1]
+
+        widget = fitz.Widget()
+        widget.rect = fitz.Rect(x, y, x+width, y+height)
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.text_fontsize = 12
+        widget.text_font = font_name
+        widget.fill_color = fill_color
+        widget.text_color = font_color
+        widget.field_name = field_name
+        widget.field_value = prefilled_text
+        widget.field_label = "arbitrary text - e.g. to help filling the field"
+
+        page.add_widget(widget)
+
+    @_editor_step
+    def place_image(self, file_name, x, y, page_number, width=10, height=10):
+        """
+        Place an image, see place_image().
+        """
+        page = self.doc[page_number-1]
+
+        # The same cached image document is shown every time, so fitz embeds
+        # the image once per document and reuses it for every placement.
+        image = _image_pdf(file_name)
+        self._images[id(image)] = image
+        page.show_pdf_page(fitz.Rect(x, y, x+width, y+height), image, 0)
+
+    @_editor_step
+    def place_text(self, text, x, y, page_number, font_size=12, font_name="helv", color=None):
+        """
+        Place text, see place_text().
+        """
+        page = self.doc[page_number-1]
+        page.insert_text(fitz.Point(x, y), str(text), fontname=font_name, color=color, fontsize=font_size)
+
+    @_editor_step
+    def fill(self, data_dict, flatten=False):
+        """
+        Fill the form fields, see write_fillable_pdf(). Text, checkbox, radio
+        and combo values are checked and written like write_fillable_pdf()
+        does, fitz builds the appearance of each field it fills.
+        """
+        data_dict = convert_dict_values_to_string(data_dict)
+        doc = self.doc
+        metrics = current_metrics()
+        filled = set()
+        buttons = OrderedDict()
+        for page in doc:
+            page_start = metrics.clock()
+            for widget in page.widgets():
+                key = widget.field_name
+                changed = flatten == True
+                if key in data_dict:
+                    filled.add(key)
+                    value = data_dict[key]
+                    if widget.field_type in (fitz.PDF_WIDGET_TYPE_CHECKBOX, fitz.PDF_WIDGET_TYPE_RADIOBUTTON):
+                        # Written once the on states of every widget of the field are known
+                        buttons.setdefault(key, []).append((widget.xref, widget.on_state()))
+                    elif widget.field_type in (fitz.PDF_WIDGET_TYPE_COMBOBOX, fitz.PDF_WIDGET_TYPE_LISTBOX):
+                        options = [option[0] if isinstance(option, (list, tuple)) else option
+                                   for option in widget.choice_values or []]
+                        if type(value) != list and value not in options:
+                            if value != "None" and value != "":
+                                raise KeyError(f"{value} Not An Option For {key}, Options are {options}")
+                        widget.field_value = value
+                        changed = True
+                    elif widget.field_type == fitz.PDF_WIDGET_TYPE_TEXT:
+                        widget.field_value = value
+                        changed = True
+                if flatten == True:
+                    widget.field_flags |= fitz.PDF_FIELD_IS_READ_ONLY
+                if changed:
+                    widget.update()
+            metrics.page(page_start)
+        for key, states in buttons.items():
+            _fill_fitz_button(doc, states, data_dict[key])
+        metrics.count(fields=len(filled), pages=doc.page_count)
+
+    @_editor_step
+    def get_coordinate_map(self, page_number=1):
+        """
+        Draw the coordinate map on a page, see get_coordinate_map().
+        """
+        page = self.doc[page_number-1]
+        max_x = page.rect[2]
+        max_y = page.rect[3]
+        
+        for y in range(0, int(math.ceil(max_y / 50.0)) * 50, 50): # Drop a dot every 20 px x and y
+            page.insert_text(fitz.Point(0 , y), str(y), fontsize=12, fontname="times-bold", color=(1, 0, 0))
+            page.draw_line(fitz.Point(0 , y), fitz.Point(max_x , y), color=(1, 0, 0))
+        
+        for x in range(0, int(math.ceil(max_x / 50.0)) * 50, 50):
+            page.insert_text(fitz.Point(x , 12), str(x), fontsize=12, fontname="times-bold", color=(1, 0, 0))
+            page.draw_line(fitz.Point(x , 12), fitz.Point(x , max_y), color=(1, 0, 0))
+
+
+@measured('rotate_page')
 def rotate_page(deg, input_pdf_path, output_map_path, page_number, **kwargs):
     """
     Rotate a page within the pdf document.
@@ -304,25 +2424,26 @@ def rotate_page(deg, input_pdf_path, output_map_path, page_number, **kwargs):
     ---------
     deg: float
         The x coordinate of the top left corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    
-    page.set_rotation(deg)
-        
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.rotate_page(deg, page_number)
+    return editor.result
 
 
+@measured('place_radiobutton')
 def place_radiobutton(field_name, x, y, input_pdf_path, output_map_path, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0), **kwargs):
     """
     Place a radio box in the pdf document. Use the get_coordinate_map
@@ -335,10 +2456,11 @@ def place_radiobutton(field_name, x, y, input_pdf_path, output_map_path, page_nu
         The x coordinate of the top left corner of the text.
     y: float
         The y coordinate of the top right corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     width: float
@@ -355,27 +2477,18 @@ def place_radiobutton(field_name, x, y, input_pdf_path, output_map_path, page_nu
     font_color: tuple
         The color to use (0,0,0) = white, (1,1,1) = black
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    
-    widget = fitz.Widget()
-    widget.rect = fitz.Rect(x, y, x+width, y+height)
-    widget.field_type = fitz.PDF_WIDGET_TYPE_RADIOBUTTON
-    widget.text_fontsize = 12
-    widget.text_color = font_color
-    widget.text_font = font_name
-    widget.fill_color = fill_color
-    widget.field_name = field_name
-    
-    page.add_widget(widget)
-        
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.place_radiobutton(field_name, x, y, page_number, width, height, font_size, font_name, fill_color, font_color)
+    return editor.result
 
 
+@measured('place_dropdown')
 def place_dropdown(field_name, values, x, y, input_pdf_path, output_map_path, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0), **kwargs):
     """
     Place a dropdown box widget in the pdf document. Use the get_coordinate_map
@@ -390,10 +2503,11 @@ def place_dropdown(field_name, values, x, y, input_pdf_path, output_map_path, pa
         The x coordinate of the top left corner of the text.
     y: float
         The y coordinate of the top right corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     width: float
@@ -410,28 +2524,18 @@ def place_dropdown(field_name, values, x, y, input_pdf_path, output_map_path, pa
     font_color: tuple
         The color to use (0,0,0) = white, (1,1,1) = black
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    widget = fitz.Widget()
-    widget.field_name = field_name
-    widget.field_label = "Drop Down"
-    widget.fill_color = fill_color
-    widget.text_color = font_color
-    widget.field_type = fitz.PDF_WIDGET_TYPE_LISTBOX
-    widget.field_flags = fitz.PDF_CH_FIELD_IS_COMMIT_ON_SEL_CHANGE
-    widget.choice_values = values
-    widget.rect = fitz.Rect(x, y, x+width, y+height)
-    widget.text_fontsize = font_size
-    widget.field_value = widget.choice_values[-1]
-    page.add_widget(widget)
-    
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.place_dropdown(field_name, values, x, y, page_number, width, height, font_size, font_name, fill_color, font_color)
+    return editor.result
 
 
+@measured('place_text_box')
 def place_text_box(field_name, prefilled_text, x, y, input_pdf_path, output_map_path, page_number, width=10, height=10, font_size=12, font_name=None, fill_color=(0.8,0.8,0.8), font_color=(0,0,0), **kwargs):
     """
     Place a fillable text box widget in the pdf document. Use the get_coordinate_map
@@ -446,10 +2550,11 @@ def place_text_box(field_name, prefilled_text, x, y, input_pdf_path, output_map_
         The x coordinate of the top left corner of the text.
     y: float
         The y coordinate of the top right corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     width: float
@@ -466,47 +2571,36 @@ def place_text_box(field_name, prefilled_text, x, y, input_pdf_path, output_map_
     font_color: tuple
         The color to use (0,0,0) = white, (1,1,1) = black
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    
-    widget = fitz.Widget()
-    widget.rect = fitz.Rect(x, y, x+width, y+height)
-    widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
-    widget.text_fontsize = 12
-    widget.text_font = font_name
-    widget.fill_color = fill_color
-    widget.text_color = font_color
-    widget.field_name = field_name
-    widget.field_value = prefilled_text
-    widget.field_label = "arbitrary text - e.g. to help filling the field"
-    
-    page.add_widget(widget)
-    field = page.first_widget
-    assert field.field_type_string == "Text"
-    
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.place_text_box(field_name, prefilled_text, x, y, page_number, width, height, font_size, font_name, fill_color, font_color)
+    return editor.result
 
 
+@measured('place_image')
 def place_image(file_name, x, y, input_pdf_path, output_map_path, page_number, width=10, height=10, **kwargs):
     """
     Place image on the pdf document. Use the get_coordinate_map
     function to help with placement.
     Parameters
     ---------
-    file_name: str
-        The path of the file to be placed in the image
+    file_name: str, bytes or file
+        The path of the file to be placed in the image, or the image itself as
+        bytes or a binary file object
     x: float
         The x coordinate of the top left corner of the text.
     y: float
         The y coordinate of the top right corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     width: float
@@ -514,17 +2608,18 @@ def place_image(file_name, x, y, input_pdf_path, output_map_path, page_number, w
     height: float
         The height of the image
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    
-    page.insert_image(fitz.Rect(x, y, x+width, y+height), filename=file_name)
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.place_image(file_name, x, y, page_number, width, height)
+    return editor.result
 
 
+@measured('place_text')
 def place_text(text, x, y, input_pdf_path, output_map_path, page_number, font_size=12, font_name="helv", color=None, **kwargs):
     """
     Place Text on the pdf document. Use the get_coordinate_map
@@ -537,10 +2632,11 @@ def place_text(text, x, y, input_pdf_path, output_map_path, page_number, font_si
         The x coordinate of the bottom left corner of the text.
     y: float
         The y coordinate of the bootom right corner of the text.
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     font_size: float
@@ -551,45 +2647,158 @@ def place_text(text, x, y, input_pdf_path, output_map_path, page_number, font_si
     color: tuple
         The color to use (0,0,0) = white, (1,1,1) = black
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
+    The pdf as bytes when output_map_path is None.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    page.insert_text(fitz.Point(x, y), str(text), fontname=font_name, color=color, fontsize=font_size)
-    doc.save(output_map_path, **kwargs)
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.place_text(text, x, y, page_number, font_size, font_name, color)
+    return editor.result
 
 
+@measured('get_coordinate_map')
 def get_coordinate_map(input_pdf_path, output_map_path, page_number=1, **kwargs):
     """
     Creates a map on the pdf page to help in the placement of text, photos,
     and widgets.
     Parameters
     ---------
-    input_pdf_path: str
-        Path to the pdf you want the fields from.
-    output_map_path: str
-        Path of the new pdf that is generated.
+    input_pdf_path: str, bytes or file
+        Path to the pdf you want the fields from, or the pdf itself
+        as bytes or a binary file object.
+    output_map_path: str, file or None
+        Path of the new pdf that is generated. None returns the pdf as bytes.
     page_number: float
         Number of the page to get the map of.
     kwargs: Dict
-        Additional arguments to pass to fitz save method.
+        Additional arguments to pass to fitz save method. incremental=True
+        appends only the changes to the original, see PdfEditor.
     Returns
     ---------
     A dictionary of form fields and their filled values.
     """
-    doc = fitz.open(input_pdf_path)
-    page = doc[page_number-1]
-    max_x = page.rect[2]
-    max_y = page.rect[3]
-        
-    for y in range(0, int(math.ceil(max_y / 50.0)) * 50, 50): # Drop a dot every 20 px x and y
-        page.insert_text(fitz.Point(0 , y), str(y), fontsize=12, fontname="times-bold", color=(1, 0, 0))
-        page.draw_line(fitz.Point(0 , y), fitz.Point(max_x , y), color=(1, 0, 0))
-        
-    for x in range(0, int(math.ceil(max_x / 50.0)) * 50, 50):
-        page.insert_text(fitz.Point(x , 12), str(x), fontsize=12, fontname="times-bold", color=(1, 0, 0))
-        page.draw_line(fitz.Point(x , 12), fitz.Point(x , max_y), color=(1, 0, 0))
-    
-    doc.save(output_map_path, **kwargs)
\ No newline at end of file
+    with PdfEditor(input_pdf_path, output_map_path, **kwargs) as editor:
+        editor.get_coordinate_map(page_number)
+    return editor.result
+
+
+_async_lock = threading.Lock()
+_async_executor = None              # the executor the async functions submit to
+_async_owns_executor = True         # False for an executor passed to configure_async()
+_async_max_workers = min(32, (os.cpu_count() or 1) + 4)
+_async_max_pending = 2 * _async_max_workers
+_async_limiters = weakref.WeakKeyDictionary()   # event loop to the semaphore bounding its calls
+
+
+def configure_async(max_workers=None, max_pending=None, executor=None):
+    """
+    Sets up the executor afill(), aget_form_fields() and aflatten() run on.
+    Calls already submitted finish on the executor they were submitted to.
+    Parameters
+    ---------
+    max_workers: int
+        Number of threads of the default executor. Defaults to the number of
+        cpus plus 4, at most 32.
+    max_pending: int
+        Number of calls submitted to the executor at a time, running or
+        queued, per event loop. Further calls wait for a free slot before
+        anything is submitted, so a burst of requests can't pile up work.
+        Defaults to twice max_workers.
+    executor: concurrent.futures.Executor
+        Runs the calls instead of a thread pool, i.e. a ProcessPoolExecutor
+        to fill on several cpus, in which case paths and bytes have to be
+        passed rather than file objects or FormTemplates. It is not shut
+        down by fillpdf.
+    Returns
+    ---------
+    """
+    global _async_executor, _async_owns_executor, _async_max_workers, _async_max_pending, _async_limiters
+    with _async_lock:
+        if _async_owns_executor and _async_executor is not None:
+            _async_executor.shutdown(wait=False)
+        _async_max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        _async_max_pending = max_pending or 2 * _async_max_workers
+        _async_executor = executor
+        _async_owns_executor = executor is None
+        _async_limiters = weakref.WeakKeyDictionary()
+
+
+def _async_slots(loop):
+    """
+    Returns the executor to submit to and the semaphore bounding the calls
+    of the event loop, creating the default thread pool on first use.
+    """
+    global _async_executor
+    with _async_lock:
+        if _async_executor is None:
+            _async_executor = futures.ThreadPoolExecutor(_async_max_workers, thread_name_prefix='fillpdf')
+        limiter = _async_limiters.get(loop)
+        if limiter is None:
+            limiter = _async_limiters[loop] = asyncio.Semaphore(_async_max_pending)
+        return _async_executor, limiter
+
+
+def _release_slot(loop, limiter):
+    """
+    Frees the slot of a finished call, from whichever thread it finished in.
+    """
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(limiter.release)
+
+
+async def _run_async(function, *args, **kwargs):
+    """
+    Runs function on the async executor once a slot is free. A caller
+    cancelled while it waits for a slot submits nothing. Cancelling a
+    submitted call drops it when it has not started yet, a running call
+    can't be interrupted and holds its slot until it finishes.
+    """
+    loop = asyncio.get_running_loop()
+    executor, limiter = _async_slots(loop)
+    await limiter.acquire()
+    try:
+        future = executor.submit(functools.partial(function, *args, **kwargs))
+    except BaseException:
+        limiter.release()
+        raise
+    future.add_done_callback(lambda _: _release_slot(loop, limiter))
+    # wrap_future cancels the executor's future when the caller is cancelled
+    return await asyncio.wrap_future(future)
+
+
+async def afill(input_pdf_path, output_pdf_path, data_dict, **kwargs):
+    """
+    Awaitable write_fillable_pdf() that runs on the executor set up by
+    configure_async() instead of blocking the event loop. Takes the same
+    arguments.
+    Returns
+    ---------
+    The pdf as bytes when output_pdf_path is None.
+    """
+    return await _run_async(write_fillable_pdf, input_pdf_path, output_pdf_path, data_dict, **kwargs)
+
+
+async def aget_form_fields(input_pdf_path, **kwargs):
+    """
+    Awaitable get_form_fields() that runs on the executor set up by
+    configure_async() instead of blocking the event loop. Takes the same
+    arguments.
+    Returns
+    ---------
+    A dictionary of form fields and their filled values.
+    """
+    return await _run_async(get_form_fields, input_pdf_path, **kwargs)
+
+
+async def aflatten(input_pdf_path, output_pdf_path, **kwargs):
+    """
+    Awaitable flatten_pdf() that runs on the executor set up by
+    configure_async() instead of blocking the event loop. Takes the same
+    arguments.
+    Returns
+    ---------
+    The pdf as bytes when output_pdf_path is None.
+    """
+    return await _run_async(flatten_pdf, input_pdf_path, output_pdf_path, **kwargs)
@@ -10,12 +10,14 @@ References:
 """
 
 import argparse
+import csv
 import json
 import logging
 import sys
-from typing import List
+from typing import Dict, Iterator, List, Optional
 
-from fillpdf import fillpdfs, __version__
+from fillpdf import fillpdfs
+from fillpdf.utils.cli import VersionAction
 
 
 _logger = logging.getLogger(__name__)
@@ -56,6 +58,94 @@ def insertfillpdf(
     return len(dict_data)
 
 
+def read_records(
+    input_records_file: str, records_format: Optional[str] = None
+) -> Iterator[Dict]:
+    """Read records one at a time from a JSON Lines or CSV file
+
+    Only the current line is held in memory, so the file can be of any size.
+    A JSON Lines line that cannot be parsed is logged and yields a ValueError
+    naming the line in place of the record, so the rest of the file is read.
+
+    Args:
+        input_records_file (str): Input JSON Lines or CSV file, ``-`` for stdin
+        records_format (str): ``jsonl`` or ``csv``, if none given, it is taken
+                              from the file extension (stdin defaults to ``jsonl``)
+
+    Yields:
+        dict: one record per line, or ValueError for a malformed line
+    """
+    if records_format is None:
+        records_format = "csv" if input_records_file.lower().endswith(".csv") else "jsonl"
+
+    if input_records_file == "-":
+        records_file = sys.stdin
+    else:
+        records_file = open(input_records_file, newline="", encoding="utf-8-sig")
+    try:
+        if records_format == "csv":
+            for record in csv.DictReader(records_file):
+                yield record
+        else:
+            for line_number, line in enumerate(records_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    _logger.error(
+                        "Line {} of {} is not valid JSON: {}".format(
+                            line_number, input_records_file, error
+                        )
+                    )
+                    yield ValueError(
+                        "line {} is not valid JSON: {}".format(line_number, error)
+                    )
+    finally:
+        if records_file is not sys.stdin:
+            records_file.close()
+
+
+def insertfillpdf_records(
+    input_pdf_file: str,
+    input_records_file: str,
+    output_pdf_pattern: str,
+    records_format: Optional[str] = None,
+    workers: int = 1,
+) -> int:
+    """Insert data from a JSON Lines or CSV file, one output PDF per record
+
+    The PDF is parsed once and the records are streamed, so memory use does not
+    grow with the size of the records file.
+
+    Args:
+        input_pdf_file (str): Input PDF file
+        input_records_file (str): Input JSON Lines or CSV file, ``-`` for stdin
+        output_pdf_pattern (str): Output PDF file name pattern, ``{index}`` is the
+                                  record number and ``{record}`` the record
+                                  (for example ``out_{record[Name]}.pdf``)
+        records_format (str): ``jsonl`` or ``csv``, if none given, it is taken
+                              from the file extension
+        workers (int): number of worker processes
+
+    Returns:
+        int: number of records written
+    """
+    records = read_records(input_records_file, records_format)
+    num_records = 0
+    for result in fillpdfs.write_fillable_pdf_batch(
+        input_pdf_file, records, output_pdf_pattern, workers=workers
+    ):
+        if result.error is None:
+            _logger.debug("Record {} written to {}".format(result.index, result.output_pdf_path))
+            num_records += 1
+        else:
+            _logger.error("Record {} failed: {!r}".format(result.index, result.error))
+            print("Record {} failed: {!r}".format(result.index, result.error))
+
+    return num_records
+
+
 # ---- CLI ----
 # The functions defined in this section are wrappers around the main Python
 # API allowing them to be called directly from the terminal as a CLI
@@ -88,19 +178,44 @@ def parse_args(args: List[str]) -> argparse.Namespace:
         type=str,
         metavar="test.json",
     )
+    parser.add_argument(
+        "-r",
+        "--records",
+        dest="input_records_file",
+        help="Input JSON Lines or CSV file with one record per line, '-' reads \
+            stdin. One PDF is written per record, named with the --output pattern",
+        type=str,
+        metavar="records.jsonl",
+    )
+    parser.add_argument(
+        "--format",
+        dest="records_format",
+        help="Format of the records file, if none given, it is taken from the \
+            extension",
+        choices=["jsonl", "csv"],
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        help="Number of worker processes used with --records",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "-o",
         "--output",
         dest="output_PDF_file",
         help="Output file to write result, if none given, it will be the input file with \
-            '_out.pdf' extension'",
+            '_out.pdf' extension'. With --records it is a pattern where {index} is the \
+            record number, if none given, it will be the input file with '_{index}.pdf'",
         type=str,
         metavar="test_out.pdf",
     )
     parser.add_argument(
         "--version",
-        action="version",
-        version="insertfillpdf {ver}".format(ver=__version__),
+        action=VersionAction,
+        version="insertfillpdf {ver}",
     )
     parser.add_argument(
         "-v",
@@ -148,6 +263,28 @@ def main(args_m: List[str]):
     args = parse_args(args_m)
     setup_logging(args.loglevel)
 
+    # records file given, write one PDF per record
+    if args.input_records_file:
+        if not args.output_PDF_file:
+            args.output_PDF_file = args.input_PDF_file.replace(".pdf", "_{index}.pdf")
+            _logger.debug("Output file pattern created: {}".format(args.output_PDF_file))
+        args.output_PDF_file = args.output_PDF_file.strip()
+
+        num_records = insertfillpdf_records(
+            args.input_PDF_file,
+            args.input_records_file.strip(),
+            args.output_PDF_file,
+            args.records_format,
+            args.workers,
+        )
+        print(
+            "{} records have been proccesed from {} to {}".format(
+                num_records, args.input_records_file, args.output_PDF_file
+            )
+        )
+        _logger.info("Script ends here")
+        return
+
     # check if JSON is given, if not, use inputfile with JSON extension
     if args.input_json_file:
         pass
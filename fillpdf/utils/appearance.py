@@ -0,0 +1,202 @@
+import re
+from typing import List, Optional
+
+import pdfrw
+
+from fillpdf.utils.base14 import BASE14_WIDTHS
+from fillpdf.utils.field_format import is_text_field_multiline
+
+FONT_OPERATOR = re.compile(r'/(\S+)\s+(-?[\d.]+)\s+Tf')
+PADDING = 2
+
+
+def glyph_widths(font: pdfrw.PdfDict) -> Optional[List[float]]:
+  """
+  Returns the widths, in 1/1000 of the font size, of the 256 codes of a simple
+  font. The table is built once per font dictionary and kept in its pdfrw
+  private attributes, which are never written to the pdf.
+
+  Parameters
+  ---------
+  font: pdfrw.PdfDict
+      A font dictionary from the form's default resources.
+
+  Returns
+  ---------
+  The width table, or None for composite (Type0) fonts.
+  """
+  widths = vars(font).get('glyph_widths')
+  if widths is not None:
+    return widths
+  if font.Subtype == '/Type0':
+    return None
+  if font.Widths:
+    missing = 0.0
+    if font.FontDescriptor and font.FontDescriptor.MissingWidth:
+      missing = float(font.FontDescriptor.MissingWidth)
+    widths = [missing] * 256
+    first_char = int(font.FirstChar or 0)
+    for index, width in enumerate(font.Widths):
+      if 0 <= first_char + index < 256:
+        widths[first_char + index] = float(width)
+  else:
+    # Fonts without /Widths are base 14 fonts, other names are measured as Helvetica
+    widths = list(BASE14_WIDTHS.get(font.BaseFont[1:] if font.BaseFont else '', BASE14_WIDTHS['Helvetica']))
+  font.private.glyph_widths = widths
+  return widths
+
+
+def text_width(encoded: bytes, widths: List[float], font_size: float) -> float:
+  """
+  Returns the width of an encoded string in points.
+  """
+  return sum(widths[code] for code in encoded) * font_size / 1000
+
+
+def wrap_lines(text: str, widths: List[float], font_size: float, max_width: float) -> List[str]:
+  """
+  Splits text into lines no wider than max_width, breaking at spaces and at
+  the line breaks already in the text.
+  """
+  lines = []
+  for paragraph in text.splitlines() or ['']:
+    line = ''
+    for word in paragraph.split(' '):
+      candidate = word if not line else line + ' ' + word
+      if line and text_width(encode_text(candidate), widths, font_size) > max_width:
+        lines.append(line)
+        line = word
+      else:
+        line = candidate
+    lines.append(line)
+  return lines
+
+
+def encode_text(text: str) -> bytes:
+  """
+  Encodes text with WinAnsiEncoding, the encoding of form fonts. Check it
+  with can_encode() first, characters it can't show become '?'.
+  """
+  return text.encode('cp1252', 'replace')
+
+
+def is_winansi(font: pdfrw.PdfDict) -> bool:
+  """
+  Returns whether a font uses WinAnsiEncoding without /Differences.
+  """
+  encoding = font.Encoding
+  if isinstance(encoding, pdfrw.PdfDict):
+    return encoding.BaseEncoding == '/WinAnsiEncoding' and not encoding.Differences
+  return encoding == '/WinAnsiEncoding'
+
+
+def can_encode(text: str, font: pdfrw.PdfDict) -> bool:
+  """
+  Returns whether the font shows text correctly once encoded with
+  encode_text(). Any WinAnsi character can be shown with a WinAnsi font.
+  Other simple fonts (a built-in, MacRoman or /Differences encoding) only
+  agree with WinAnsi on printable ASCII, and symbol fonts on nothing.
+  """
+  if font.BaseFont in ('/Symbol', '/ZapfDingbats'):
+    return False
+  if not is_winansi(font):
+    return all(' ' <= char <= '~' for char in text.replace('\n', '').replace('\r', ''))
+  try:
+    text.encode('cp1252')
+  except UnicodeEncodeError:
+    return False
+  return True
+
+
+def text_appearance(widget: pdfrw.PdfDict, field: pdfrw.PdfDict, acroform: pdfrw.PdfDict,
+                    value: str) -> Optional[pdfrw.PdfDict]:
+  """
+  Builds the normal appearance stream of a text or combo box widget showing
+  value, laid out with the font and size of the field's /DA.
+
+  Parameters
+  ---------
+  widget: pdfrw.PdfDict
+      The widget annotation the appearance is for.
+  field: pdfrw.PdfDict
+      The field dictionary holding /DA, /Q and /Ff when the widget does not.
+  acroform: pdfrw.PdfDict
+      The /AcroForm dictionary with the default resources.
+  value: str
+      The text to show.
+
+  Returns
+  ---------
+  A form XObject, or None when the appearance has to be left to the viewer
+  (no /DA or font, a composite font, a value the font's encoding can't
+  show, rotated widgets or comb fields).
+  """
+  default_appearance = widget['/DA'] or field['/DA'] or (acroform and acroform['/DA'])
+  resources = acroform and acroform['/DR']
+  if not default_appearance or not resources or not resources.Font or not widget.Rect:
+    return None
+  default_appearance = default_appearance.decode()
+  match = FONT_OPERATOR.search(default_appearance)
+  if match is None:
+    return None
+  font_name, font_size = match.group(1), float(match.group(2))
+  font = resources.Font[pdfrw.PdfName(font_name)]
+  if font is None:
+    return None
+  widths = glyph_widths(font)
+  if widths is None or not can_encode(value, font):
+    return None
+  if widget.MK and widget.MK.R and int(widget.MK.R) % 360:
+    return None
+  flags = int(widget['/Ff'] or field['/Ff'] or 0)
+  if flags & (1 << 24):
+    return None
+
+  x1, y1, x2, y2 = [float(x) for x in widget.Rect]
+  width, height = abs(x2 - x1), abs(y2 - y1)
+  multiline = is_text_field_multiline(flags)
+  if flags & (1 << 13):
+    value = '*' * len(value)
+  if font_size == 0:
+    font_size = 12 if multiline else max(4.0, min(12.0, (height - 2 * PADDING) / 1.15))
+    if not multiline:
+      text_size = text_width(encode_text(value), widths, 1000)
+      if text_size:
+        font_size = max(4.0, min(font_size, (width - 2 * PADDING) * 1000 / text_size))
+
+  if multiline:
+    lines = wrap_lines(value, widths, font_size, width - 2 * PADDING)
+    top = height - PADDING - font_size
+  else:
+    lines = [value]
+    top = (height - font_size) / 2 + 0.22 * font_size
+  alignment = int(widget.Q or field.Q or (acroform and acroform.Q) or 0)
+
+  operators = ['/Tx BMC', 'q',
+               f'{PADDING / 2:g} {PADDING / 2:g} {width - PADDING:g} {height - PADDING:g} re W n',
+               'BT', FONT_OPERATOR.sub(f'/{font_name} {font_size:g} Tf', default_appearance)]
+  leading = font_size * 1.15
+  previous_x, previous_y = 0.0, 0.0
+  for index, line in enumerate(lines):
+    encoded = encode_text(line)
+    line_width = text_width(encoded, widths, font_size)
+    if alignment == 1:
+      x = (width - line_width) / 2
+    elif alignment == 2:
+      x = width - PADDING - line_width
+    else:
+      x = PADDING
+    y = top - index * leading
+    operators.append(f'{x - previous_x:.2f} {y - previous_y:.2f} Td')
+    operators.append(f'{pdfrw.PdfString.from_bytes(encoded)} Tj')
+    previous_x, previous_y = x, y
+  operators.extend(['ET', 'Q', 'EMC'])
+
+  appearance = pdfrw.IndirectPdfDict(
+    Type=pdfrw.PdfName.XObject,
+    Subtype=pdfrw.PdfName.Form,
+    BBox=pdfrw.PdfArray([0, 0, round(width, 2), round(height, 2)]),
+    Resources=pdfrw.PdfDict(Font=pdfrw.PdfDict({pdfrw.PdfName(font_name): font})),
+  )
+  appearance.stream = '\n'.join(operators)
+  return appearance
@@ -0,0 +1,24 @@
+import argparse
+import sys
+
+
+class VersionAction(argparse.Action):
+  """
+  A --version option that looks up fillpdf.__version__ only when it is used,
+  since reading the package metadata takes longer than the rest of a command's
+  startup.
+
+  Parameters
+  ---------
+  version: str
+      The message to print, {ver} is replaced by the version.
+  """
+  def __init__(self, option_strings, version, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+               help="show program's version number and exit"):
+    super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+    self.version = version
+
+  def __call__(self, parser, namespace, values, option_string=None):
+    import fillpdf
+    print(self.version.format(ver=fillpdf.__version__), file=sys.stdout)
+    parser.exit()
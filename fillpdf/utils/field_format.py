@@ -2,7 +2,10 @@ from typing import Optional
 
 
 def is_text_field_multiline(field_format: int) -> bool:
-  return "{0:b}".format(field_format)[-13] == 1
+  """
+  Returns whether the Multiline flag, bit 13 of a text field's /Ff, is set.
+  """
+  return bool(int(field_format) & (1 << 12))
 
 def make_read_only(field_format: Optional[str]) -> int:
   """
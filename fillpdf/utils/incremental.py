@@ -0,0 +1,158 @@
+import re
+from typing import Container, Iterable, List, Optional, Tuple
+
+import pdfrw
+from pdfrw.objects.pdfindirect import PdfIndirect
+from pdfrw.pdfwriter import user_fmt
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+
+
+def original_startxref(original: bytes) -> int:
+  """
+  Returns the offset of the last cross-reference section of a pdf.
+  """
+  matches = STARTXREF.findall(original[-1024:])
+  if not matches:
+    raise ValueError('startxref not found at the end of the pdf')
+  return int(matches[-1])
+
+
+def incremental_update(original: bytes, trailer: pdfrw.PdfDict, objects: Iterable[pdfrw.PdfDict],
+                       object_offsets: Container[Tuple[int, int]]) -> Optional[bytes]:
+  """
+  Serializes modified objects of a pdf read by pdfrw as an incremental update
+  section, to be appended to the original bytes. Every object keeps the
+  number it was read with, objects created since (i.e. appearance streams)
+  get new numbers after the original /Size.
+
+  Parameters
+  ---------
+  original: bytes
+      The pdf the trailer was read from.
+  trailer: pdfrw.PdfDict
+      The pdfrw reader of the original.
+  objects: Iterable[pdfrw.PdfDict]
+      The indirect objects read from the original that were modified.
+  object_offsets: Container[Tuple[int, int]]
+      The (number, generation) of the objects stored outside object streams
+      in the original, the obj_offsets of the pdfrw reader's source.
+
+  Returns
+  ---------
+  The update section, empty when no object was modified, or None when the
+  pdf has to be rewritten: the original is encrypted, an object has no object
+  number, or an object is stored in an object stream, whose later versions
+  pdfrw does not read back.
+  """
+  if trailer.Encrypt is not None:
+    return None
+  next_number = [int(trailer.Size)]
+  pending: List[Tuple[Tuple[int, int], object]] = []
+  for obj in objects:
+    if not isinstance(obj.indirect, tuple) or obj.indirect not in object_offsets:
+      return None
+    pending.append((obj.indirect, obj))
+  if not pending:
+    # Nothing changed, the original is already the filled pdf
+    return b''
+  new_numbers = {}
+
+  def reference(obj) -> str:
+    number = new_numbers.get(id(obj))
+    if number is None:
+      number = new_numbers[id(obj)] = next_number[0]
+      next_number[0] += 1
+      pending.append(((number, 0), obj))
+    return '%d 0 R' % number
+
+  def format_value(obj) -> str:
+    if isinstance(obj, PdfIndirect):
+      return '%d %d R' % obj
+    indirect = getattr(obj, 'indirect', False)
+    if isinstance(indirect, tuple):
+      return '%d %d R' % indirect
+    if isinstance(obj, pdfrw.PdfDict):
+      if indirect or obj.stream is not None:
+        return reference(obj)
+      return format_dict(obj)
+    if isinstance(obj, pdfrw.PdfArray):
+      if indirect:
+        return reference(obj)
+      return '[%s]' % ' '.join(format_value(value) for value in list.__iter__(obj))
+    if isinstance(obj, (list, tuple)):
+      return '[%s]' % ' '.join(format_value(value) for value in obj)
+    if hasattr(obj, 'indirect'):
+      return str(getattr(obj, 'encoded', None) or obj)
+    return user_fmt(obj)
+
+  def format_dict(obj: pdfrw.PdfDict) -> str:
+    pairs = ['%s %s' % (getattr(key, 'encoded', None) or key, format_value(value))
+             for key, value in dict.items(obj) if value is not None]
+    return '<<%s>>' % ' '.join(pairs)
+
+  update = bytearray(b'' if original.endswith(b'\n') else b'\n')
+  base = len(original) + len(update)
+  offsets = {}
+  while pending:
+    (number, generation), obj = pending.pop(0)
+    if number in offsets:
+      continue
+    offsets[number] = (base + len(update), generation)
+    if isinstance(obj, pdfrw.PdfDict):
+      stream = obj.stream
+      if stream is not None:
+        obj.Length = len(stream)
+      body = format_dict(obj)
+      if stream is not None:
+        body = '%s\nstream\n%s\nendstream' % (body, stream)
+    elif isinstance(obj, pdfrw.PdfArray):
+      body = '[%s]' % ' '.join(format_value(value) for value in list.__iter__(obj))
+    else:
+      body = format_value(obj)
+    update += ('%d %d obj\n%s\nendobj\n' % (number, generation, body)).encode('latin-1')
+
+  size = max(int(trailer.Size), max(offsets) + 1)
+  prev = original_startxref(original)
+  entries = dict(Size=size, Root=trailer.Root, Info=trailer.Info, ID=trailer.ID, Prev=prev)
+  if original[prev:prev + 4] == b'xref':
+    xref_offset = base + len(update)
+    update += b'xref\n'
+    for start, numbers in _subsections(sorted(offsets)):
+      update += b'%d %d\n' % (start, len(numbers))
+      for number in numbers:
+        update += b'%010d %05d n \n' % offsets[number]
+    update += b'trailer\n'
+    update += format_dict(pdfrw.PdfDict(**entries)).encode('latin-1')
+  else:
+    # The original uses a cross-reference stream, so the update does too
+    xref_number = size
+    xref_offset = base + len(update)
+    offsets[xref_number] = (xref_offset, 0)
+    entries['Size'] = xref_number + 1
+    data = bytearray()
+    index = []
+    for start, numbers in _subsections(sorted(offsets)):
+      index.extend([start, len(numbers)])
+      for number in numbers:
+        offset, generation = offsets[number]
+        data += bytes([1]) + offset.to_bytes(4, 'big') + generation.to_bytes(2, 'big')
+    xref = pdfrw.PdfDict(Type=pdfrw.PdfName.XRef, W=pdfrw.PdfArray([1, 4, 2]),
+                         Index=pdfrw.PdfArray(index), Length=len(data), **entries)
+    update += ('%d 0 obj\n%s\nstream\n' % (xref_number, format_dict(xref))).encode('latin-1')
+    update += data + b'\nendstream\nendobj\n'
+  update += b'\nstartxref\n%d\n%%%%EOF\n' % xref_offset
+  return bytes(update)
+
+
+def _subsections(numbers: List[int]) -> List[Tuple[int, List[int]]]:
+  """
+  Groups sorted object numbers into runs of consecutive numbers.
+  """
+  runs: List[Tuple[int, List[int]]] = []
+  for number in numbers:
+    if runs and runs[-1][1][-1] == number - 1:
+      runs[-1][1].append(number)
+    else:
+      runs.append((number, [number]))
+  return runs
@@ -0,0 +1,21 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+  """
+  Stands in for a module that is imported on first attribute access, so
+  importing fillpdf does not pay for backends (fitz, Pillow, pdf2image...)
+  a program never calls.
+
+  Parameters
+  ---------
+  name: str
+      The absolute name of the module, i.e. 'PIL.Image'.
+  """
+  def __getattr__(self, attribute: str) -> Any:
+    module = importlib.import_module(self.__name__)
+    # Later lookups find the attributes on the stand-in and don't get here
+    self.__dict__.update(module.__dict__)
+    return getattr(module, attribute)
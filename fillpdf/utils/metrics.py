@@ -0,0 +1,224 @@
+import contextlib
+import functools
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Called with the OperationMetrics of every finished operation, see set_metrics_sink()
+_sink: Optional[Callable[['OperationMetrics'], None]] = None
+# The operation the phases and counts of the running code are reported to
+_current: ContextVar = ContextVar('fillpdf_metrics', default=None)
+
+
+class OperationMetrics(object):
+  """
+  The timings and counts of one call to a public function, handed to the
+  metrics sink when the call returns or raises.
+
+  Attributes
+  ---------
+  operation: str
+      The name of the function, i.e. 'write_fillable_pdf'.
+  seconds: float
+      The duration of the whole call.
+  phases: Dict[str, float]
+      Seconds spent per phase: 'parse', 'hash', 'fields', 'fill',
+      'appearances', 'flatten', 'render', 'bake' and 'serialize', or the
+      name of the PdfEditor method. A phase run several times is summed,
+      'appearances' is part of 'fill'.
+  counts: Dict[str, int]
+      'fields', 'pages', 'bytes_read' and 'bytes_written' when known.
+  page_seconds: List[float]
+      The time spent on each page, for the steps that go page by page.
+  error: Optional[BaseException]
+      The exception the call raised, None when it succeeded.
+  """
+  enabled = True
+
+  def __init__(self, operation: str):
+    self.operation = operation
+    self.seconds = 0.0
+    self.phases: Dict[str, float] = {}
+    self.counts: Dict[str, int] = {}
+    self.page_seconds: List[float] = []
+    self.error: Optional[BaseException] = None
+    self._start = time.perf_counter()
+
+  @contextlib.contextmanager
+  def phase(self, name: str) -> Iterator[None]:
+    """
+    Adds the duration of the with block to the phase.
+    """
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+  def count(self, **counts: int) -> None:
+    """
+    Adds to the named counts.
+    """
+    for name, value in counts.items():
+      self.counts[name] = self.counts.get(name, 0) + value
+
+  def clock(self) -> float:
+    """
+    Returns the start time to pass to record() or page().
+    """
+    return time.perf_counter()
+
+  def record(self, name: str, start: float) -> None:
+    """
+    Adds the time since start, a value from clock(), to the phase.
+    """
+    self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+  def page(self, start: float) -> None:
+    """
+    Records the time spent on a page since start, a value from clock().
+    """
+    self.page_seconds.append(time.perf_counter() - start)
+
+  def __repr__(self) -> str:
+    return 'OperationMetrics(%r, seconds=%.6f, phases=%r, counts=%r)' % (
+      self.operation, self.seconds, self.phases, self.counts)
+
+
+class _NoMetrics(object):
+  """
+  Stands in for OperationMetrics when no sink is attached, every method does
+  nothing so instrumented code costs a method call per phase.
+  """
+  enabled = False
+  _null_context = contextlib.nullcontext()
+
+  def phase(self, name: str) -> contextlib.nullcontext:
+    return self._null_context
+
+  def count(self, **counts: int) -> None:
+    pass
+
+  def clock(self) -> float:
+    return 0.0
+
+  def record(self, name: str, start: float) -> None:
+    pass
+
+  def page(self, start: float) -> None:
+    pass
+
+
+NO_METRICS = _NoMetrics()
+
+
+def set_metrics_sink(sink: Optional[Callable[[OperationMetrics], None]]) -> Optional[Callable[[OperationMetrics], None]]:
+  """
+  Attaches the callable every OperationMetrics is passed to, for all threads
+  of the process. None detaches it, which turns the instrumentation off.
+
+  Returns
+  ---------
+  The sink attached before.
+  """
+  global _sink
+  previous, _sink = _sink, sink
+  return previous
+
+
+@contextlib.contextmanager
+def metrics_sink(sink: Optional[Callable[[OperationMetrics], None]]) -> Iterator[None]:
+  """
+  Attaches a sink for the duration of the with block.
+  """
+  previous = set_metrics_sink(sink)
+  try:
+    yield
+  finally:
+    set_metrics_sink(previous)
+
+
+def current_metrics():
+  """
+  Returns the OperationMetrics the running code reports to, or NO_METRICS.
+  """
+  metrics = _current.get()
+  return NO_METRICS if metrics is None else metrics
+
+
+def start_operation(operation: str) -> Optional[OperationMetrics]:
+  """
+  Starts the metrics of an operation that outlives a with block, i.e. a
+  generator or an editor object. Returns None when no sink is attached or
+  the operation runs inside another one, which it then reports to.
+  """
+  if _sink is None or _current.get() is not None:
+    return None
+  return OperationMetrics(operation)
+
+
+def finish_operation(metrics: OperationMetrics, error: Optional[BaseException] = None) -> None:
+  """
+  Ends an operation from start_operation() and hands it to the sink.
+  """
+  metrics.seconds = time.perf_counter() - metrics._start
+  metrics.error = error
+  sink = _sink
+  if sink is not None:
+    sink(metrics)
+
+
+@contextlib.contextmanager
+def active(metrics: OperationMetrics) -> Iterator[OperationMetrics]:
+  """
+  Makes metrics the operation reported to inside the with block.
+  """
+  token = _current.set(metrics)
+  try:
+    yield metrics
+  finally:
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def measure(operation: str) -> Iterator:
+  """
+  Measures the with block as one operation. Yields the OperationMetrics to
+  report phases and counts to, or NO_METRICS when no sink is attached.
+  Operations called inside another one (i.e. FormTemplate.write from
+  write_fillable_pdf) add their phases to the outer one.
+  """
+  metrics = _current.get()
+  if metrics is not None:
+    yield metrics
+    return
+  if _sink is None:
+    yield NO_METRICS
+    return
+  metrics = OperationMetrics(operation)
+  error = None
+  token = _current.set(metrics)
+  try:
+    yield metrics
+  except BaseException as raised:
+    error = raised
+    raise
+  finally:
+    _current.reset(token)
+    finish_operation(metrics, error)
+
+
+def measured(operation: str) -> Callable:
+  """
+  Decorates a function so every call is measured as the operation. Without a
+  sink, or inside another operation, the function is called straight away.
+  """
+  def decorator(function: Callable) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if _sink is None or _current.get() is not None:
+        return function(*args, **kwargs)
+      with measure(operation):
+        return function(*args, **kwargs)
+    return wrapper
+  return decorator
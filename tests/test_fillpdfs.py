@@ -0,0 +1,505 @@
+import io
+import os
+
+import pdfrw
+import pytest
+
+from fillpdf import fillpdfs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NEW_PDF = os.path.join(HERE, '..', 'new.pdf')
+EX_PDF = os.path.join(HERE, '..', 'ex.pdf')
+
+
+def test_form_template_indexes_fields():
+  template = fillpdfs.FormTemplate(NEW_PDF)
+  assert template.fields['Given Name Text Box'].kind == 'text'
+  assert template.fields['Language 1 Check Box'].export_states == ['Yes']
+  assert template.fields['Gender List Box'].options == ['Man', 'Woman']
+
+def test_form_template_matches_write_fillable_pdf(tmp_path):
+  data_dict = {'Given Name Text Box': 'John', 'Gender List Box': 'Man', 'Language 1 Check Box': 'Off'}
+  fillpdfs.write_fillable_pdf(NEW_PDF, str(tmp_path / 'a.pdf'), data_dict)
+  fillpdfs.FormTemplate(NEW_PDF).write(str(tmp_path / 'b.pdf'), data_dict)
+  assert fillpdfs.get_form_fields(str(tmp_path / 'a.pdf')) == fillpdfs.get_form_fields(str(tmp_path / 'b.pdf'))
+
+def test_form_template_is_not_modified_by_fill(tmp_path):
+  template = fillpdfs.FormTemplate(EX_PDF)
+  template.write(str(tmp_path / 'a.pdf'), {'Kontrollkästchen1': '2', 'Text2': 'hi'})
+  template.write(str(tmp_path / 'b.pdf'), {})
+  assert fillpdfs.get_form_fields(str(tmp_path / 'a.pdf'))['Kontrollkästchen1'] == '2'
+  assert fillpdfs.get_form_fields(str(tmp_path / 'b.pdf')) == fillpdfs.get_form_fields(EX_PDF)
+
+def test_form_template_clone_and_save_wait_for_a_write_in_progress():
+  import threading
+  template = fillpdfs.FormTemplate(NEW_PDF)
+  results = []
+  with template._filled({'Given Name Text Box': 'John'}, False):
+    threads = [threading.Thread(target=lambda: results.append(template.clone().save())),
+               threading.Thread(target=lambda: results.append(template.save()))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join(0.2)
+    assert results == []
+  for thread in threads:
+    thread.join(5)
+  assert [fillpdfs.get_form_fields(pdf) for pdf in results] == [fillpdfs.get_form_fields(NEW_PDF)] * 2
+
+def test_form_template_rejects_unknown_radio_option(tmp_path):
+  with pytest.raises(KeyError):
+    fillpdfs.FormTemplate(EX_PDF).write(str(tmp_path / 'a.pdf'), {'Kontrollkästchen1': '7'})
+
+def test_write_fillable_pdf_batch_reports_errors_per_record(tmp_path):
+  records = [{'Text2': 'a'}, {'Kontrollkästchen1': '7'}, {'Text2': 'c'}]
+  pattern = str(tmp_path / 'out_{index}.pdf')
+  results = list(fillpdfs.write_fillable_pdf_batch(EX_PDF, records, pattern, workers=2))
+  assert [result.index for result in results] == [0, 1, 2]
+  assert [result.error is None for result in results] == [True, False, True]
+  assert fillpdfs.get_form_fields(str(tmp_path / 'out_2.pdf'))['Text2'] == 'c'
+
+def test_write_fillable_pdf_accepts_and_returns_bytes():
+  with open(NEW_PDF, 'rb') as pdf_file:
+    data = pdf_file.read()
+  filled = fillpdfs.write_fillable_pdf(memoryview(data), None, {'Given Name Text Box': 'John'})
+  assert isinstance(filled, bytes)
+  assert fillpdfs.get_form_fields(io.BytesIO(filled))['Given Name Text Box'] == 'John'
+
+def test_write_fillable_pdf_accepts_form_template():
+  template = fillpdfs.FormTemplate(NEW_PDF)
+  filled = fillpdfs.write_fillable_pdf(template, None, {'Given Name Text Box': 'John'})
+  assert fillpdfs.get_form_fields(filled)['Given Name Text Box'] == 'John'
+  assert fillpdfs.get_form_fields(template.save()) == fillpdfs.get_form_fields(NEW_PDF)
+
+def test_write_fillable_pdf_fills_radio_group():
+  filled = fillpdfs.write_fillable_pdf(EX_PDF, None, {'Kontrollkästchen1': '2', 'Kontrollkästchen2': ''})
+  fields = fillpdfs.get_form_fields(filled)
+  assert fields['Kontrollkästchen1'] == '2'
+  assert fields['Kontrollkästchen2'] is None
+  with pytest.raises(KeyError):
+    fillpdfs.write_fillable_pdf(EX_PDF, None, {'Kontrollkästchen1': '7'})
+
+def test_get_form_fields_with_field_names_filters_fields():
+  fields = fillpdfs.get_form_fields(os.path.join(HERE, '..', 'newflat.pdf'), field_names=['Gender List Box', 'Missing'])
+  assert fields == {'Gender List Box': 'Man'}
+  assert dict(fillpdfs.iter_form_fields(NEW_PDF)) == fillpdfs.get_form_fields(NEW_PDF)
+
+def test_get_form_fields_with_field_names_keys_and_decodes_like_all_fields():
+  names = ['Kontrollkästchen1', 'Kontrollkästchen4', 'Text2']
+  all_fields = fillpdfs.get_form_fields(EX_PDF)
+  assert fillpdfs.get_form_fields(EX_PDF, field_names=names) == {name: all_fields[name] for name in names}
+  assert all_fields['Kontrollkästchen1'] is None
+  # a field under a parent keeps its partial name
+  pdf = pdfrw.PdfReader(NEW_PDF)
+  field = next(annot for annot in pdf.pages[0].Annots if annot.T == '(Given Name Text Box)')
+  parent = pdfrw.IndirectPdfDict(T=pdfrw.PdfString.encode('person'), Kids=pdfrw.PdfArray([field]))
+  field.Parent = parent
+  pdf.Root.AcroForm.Fields = pdfrw.PdfArray([parent] + [each for each in pdf.Root.AcroForm.Fields if each is not field])
+  output = io.BytesIO()
+  pdfrw.PdfWriter().write(output, pdf)
+  nested = output.getvalue()
+  assert fillpdfs.get_form_fields(nested, field_names=['Given Name Text Box']) == {'Given Name Text Box': '1'}
+
+def test_write_fillable_pdf_vector_flatten_removes_fields():
+  import fitz
+  data_dict = {'Given Name Text Box': 'Johnathan', 'Country Combo Box': 'Spain'}
+  flat = fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict, flatten=True, as_vector=True)
+  doc = fitz.open(stream=flat, filetype='pdf')
+  assert fillpdfs.get_form_fields(flat) == {}
+  assert 'Johnathan' in doc[0].get_text()
+  assert 'Spain' in doc[0].get_text()
+
+def test_write_fillable_pdf_builds_text_appearance_streams():
+  filled = fillpdfs.write_fillable_pdf(EX_PDF, None, {'Text2': 'Johnathan'})
+  pdf = pdfrw.PdfReader(fdata=filled)
+  widget = next(annot for annot in pdf.pages[0].Annots if annot.T == '(Text2)')
+  assert '(Johnathan) Tj' in widget.AP.N.stream
+  assert '/Verdana 8 Tf' in widget.AP.N.stream
+  assert pdf.Root.AcroForm.NeedAppearances is None
+
+def test_pdf_editor_saves_once_on_exit():
+  import fitz
+  with fillpdfs.PdfEditor(EX_PDF) as editor:
+    for index in range(5):
+      editor.place_text(f'stamp {index}', 50, 50 + 20 * index, 1)
+    editor.place_text_box('stamped box', 'boxed', 10, 10, 1, width=80, height=20)
+    editor.rotate_page(90, 1)
+    assert editor.result is None
+  doc = fitz.open(stream=editor.result, filetype='pdf')
+  assert 'stamp 4' in doc[0].get_text()
+  assert doc[0].rotation == 90
+  assert fillpdfs.get_form_fields(editor.result)['stamped box'] == 'boxed'
+
+def test_place_radiobutton_places_buttons_of_one_group():
+  with fillpdfs.PdfEditor(EX_PDF) as editor:
+    for index in range(3):
+      editor.place_radiobutton('bench radio', 10 + 20 * index, 10, 1)
+  assert 'bench radio' in fillpdfs.get_form_fields(editor.result)
+
+def test_place_image_embeds_repeated_image_once(tmp_path):
+  import fitz
+  from PIL import Image
+  logo = str(tmp_path / 'logo.png')
+  Image.new('RGB', (40, 20), (200, 30, 30)).save(logo)
+  with fillpdfs.PdfEditor(EX_PDF) as editor:
+    for page_number in (1, 1, 2):
+      editor.place_image(logo, 10, 10, page_number, width=40, height=20)
+  doc = fitz.open(stream=editor.result, filetype='pdf')
+  images = set(image[0] for page in doc for image in page.get_images(full=True))
+  assert len(images) == 1
+  assert len(doc[0].get_image_info()) == 2
+
+def test_place_text_incremental_appends_to_original(tmp_path):
+  import fitz
+  original = open(EX_PDF, 'rb').read()
+  stamped = fillpdfs.place_text('stamp', 50, 50, original, None, 1, incremental=True)
+  assert stamped.startswith(original)
+  assert 'stamp' in fitz.open(stream=stamped, filetype='pdf')[0].get_text()
+  in_place = str(tmp_path / 'in_place.pdf')
+  with open(in_place, 'wb') as pdf:
+    pdf.write(stamped)
+  fillpdfs.place_text('again', 50, 80, in_place, in_place, 1, incremental=True)
+  assert open(in_place, 'rb').read().startswith(stamped)
+
+def test_write_fillable_pdf_incremental_appends_update():
+  original = open(NEW_PDF, 'rb').read()
+  data_dict = {'Given Name Text Box': 'Jane', 'Country Combo Box': 'Spain'}
+  filled = fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict, incremental=True)
+  assert filled.startswith(original)
+  assert len(filled) - len(original) < len(original) // 4
+  assert fillpdfs.get_form_fields(filled) == fillpdfs.get_form_fields(fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict))
+
+@pytest.mark.parametrize('data_dict', [{}, {'No Such Field': 'x'}])
+def test_write_fillable_pdf_incremental_without_changes_returns_original(tmp_path, data_dict):
+  original = open(NEW_PDF, 'rb').read()
+  assert fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict, incremental=True) == original
+  pattern = str(tmp_path / 'out_{index}.pdf')
+  results = list(fillpdfs.write_fillable_pdf_batch(NEW_PDF, [data_dict], pattern, workers=1, incremental=True))
+  assert results[0].error is None
+  assert (tmp_path / 'out_0.pdf').read_bytes() == original
+
+def test_form_template_incremental_without_fields_returns_original():
+  writer = pdfrw.PdfWriter()
+  writer.addpage(pdfrw.PdfDict(Type=pdfrw.PdfName.Page, MediaBox=[0, 0, 612, 792]))
+  blank = io.BytesIO()
+  writer.write(blank)
+  assert fillpdfs.FormTemplate(blank.getvalue()).write(None, {'x': 'y'}, incremental=True) == blank.getvalue()
+
+def test_write_fillable_pdf_incremental_rewrites_object_streams():
+  # ex.pdf keeps its fields in object streams, pdfrw would not read an update to them
+  filled = fillpdfs.write_fillable_pdf(EX_PDF, None, {'Text2': 'Jane'}, incremental=True)
+  assert fillpdfs.get_form_fields(filled)['Text2'] == 'Jane'
+
+def test_write_fillable_pdf_compress_uses_object_streams():
+  data_dict = {'Given Name Text Box': 'Jane'}
+  plain = fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict)
+  compressed = fillpdfs.write_fillable_pdf(NEW_PDF, None, data_dict, compress=True)
+  assert b'/ObjStm' in compressed
+  assert len(compressed) < len(plain)
+  assert fillpdfs.get_form_fields(compressed) == fillpdfs.get_form_fields(plain)
+
+def test_write_fillable_pdf_merged_renames_fields_and_shares_resources():
+  import fitz
+  records = [{'Given Name Text Box': f'Name {index}'} for index in range(3)]
+  merged = fillpdfs.write_fillable_pdf_merged(NEW_PDF, records, None)
+  single = fillpdfs.write_fillable_pdf(NEW_PDF, None, records[0])
+  fields = dict(fillpdfs.iter_form_fields(merged))
+  assert [fields[f'record{index}.Given Name Text Box'] for index in range(3)] == ['Name 0', 'Name 1', 'Name 2']
+  assert fitz.open(stream=merged, filetype='pdf').page_count == 3 * fitz.open(NEW_PDF).page_count
+  assert len(merged) < 2 * len(single)
+
+def test_metrics_sink_reports_each_operation_once():
+  records = []
+  with fillpdfs.metrics_sink(records.append):
+    fillpdfs.write_fillable_pdf(NEW_PDF, None, {'Given Name Text Box': 'John'}, incremental=True)
+    with fillpdfs.PdfEditor(EX_PDF) as editor:
+      editor.place_text('stamp', 50, 50, 1)
+  fillpdfs.get_form_fields(NEW_PDF)
+  assert [record.operation for record in records] == ['write_fillable_pdf', 'PdfEditor']
+  write, edit = records
+  assert {'parse', 'fill', 'serialize'} <= set(write.phases)
+  assert write.counts['fields'] == 1
+  assert write.counts['bytes_read'] == os.path.getsize(NEW_PDF)
+  assert write.counts['bytes_written'] > write.counts['bytes_read']
+  assert 'place_text' in edit.phases and edit.error is None
+
+def test_async_functions_run_off_the_event_loop():
+  import asyncio
+  async def main():
+    return await asyncio.gather(
+      fillpdfs.afill(NEW_PDF, None, {'Given Name Text Box': 'John'}),
+      fillpdfs.aget_form_fields(NEW_PDF, field_names=['Given Name Text Box']),
+      fillpdfs.aflatten(NEW_PDF, None))
+  filled, fields, flat = asyncio.run(main())
+  assert fillpdfs.get_form_fields(filled)['Given Name Text Box'] == 'John'
+  assert fields == fillpdfs.get_form_fields(NEW_PDF, field_names=['Given Name Text Box'])
+  assert flat.startswith(b'%PDF')
+
+def test_async_calls_wait_for_a_free_slot_and_can_be_cancelled():
+  import asyncio
+  import threading
+  release = threading.Event()
+  started = []
+  def job(name):
+    started.append(name)
+    release.wait(5)
+    return name
+  async def main():
+    first = asyncio.ensure_future(fillpdfs._run_async(job, 'first'))
+    second = asyncio.ensure_future(fillpdfs._run_async(job, 'second'))
+    await asyncio.sleep(0.1)
+    assert started == ['first']
+    second.cancel()
+    release.set()
+    assert await first == 'first'
+    with pytest.raises(asyncio.CancelledError):
+      await second
+    # the slot of the first call is free again
+    assert await fillpdfs.aget_form_fields(NEW_PDF)
+  fillpdfs.configure_async(max_workers=1, max_pending=1)
+  try:
+    asyncio.run(main())
+  finally:
+    fillpdfs.configure_async()
+  assert started == ['first']
+
+def test_import_does_not_load_backends():
+  import subprocess
+  import sys
+  heavy = ['fitz', 'PIL', 'pdf2image', 'pdfrw', 'asyncio', 'sqlite3', 'importlib.metadata']
+  check = f"import sys, fillpdf.fillpdfs; print([m for m in {heavy!r} if m in sys.modules])"
+  output = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True,
+                          cwd=os.path.join(HERE, '..')).stdout
+  assert output.strip() == '[]'
+  # a pdfrw fill, appearance streams included, never loads PyMuPDF
+  check = ("import sys; from fillpdf import fillpdfs; "
+           "fillpdfs.write_fillable_pdf('new.pdf', None, {'Given Name Text Box': 'John', 'Country Combo Box': 'Spain'}); "
+           "print('fitz' in sys.modules)")
+  output = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True,
+                          cwd=os.path.join(HERE, '..')).stdout
+  assert output.strip() == 'False'
+
+PARITY_RECORDS = [
+  (NEW_PDF, {'Given Name Text Box': 'Jöhn (x) €', 'Height Formatted Field': 180, 'Language 1 Check Box': 'Off',
+             'Language 4 Check Box': 'Yes', 'Country Combo Box': 'Germany', 'Gender List Box': 'Man'}),
+  (EX_PDF, {'Text2': 'abc', 'Currency': '12.5', 'Kontrollkästchen1': '2', 'Kontrollkästchen2': '1'}),
+]
+
+@pytest.mark.parametrize('input_pdf_path', [NEW_PDF, EX_PDF])
+def test_get_form_fields_engines_agree(input_pdf_path):
+  assert fillpdfs.get_form_fields(input_pdf_path, engine='pymupdf') == fillpdfs.get_form_fields(input_pdf_path)
+
+@pytest.mark.parametrize('flatten', [False, True])
+@pytest.mark.parametrize('input_pdf_path, data_dict', PARITY_RECORDS)
+def test_write_fillable_pdf_engines_agree(input_pdf_path, data_dict, flatten):
+  expected = fillpdfs.get_form_fields(fillpdfs.write_fillable_pdf(input_pdf_path, None, data_dict, flatten=flatten))
+  filled = fillpdfs.write_fillable_pdf(input_pdf_path, None, data_dict, flatten=flatten, engine='pymupdf')
+  assert fillpdfs.get_form_fields(filled) == expected
+  assert fillpdfs.get_form_fields(filled, engine='pymupdf') == expected
+  assert expected != fillpdfs.get_form_fields(input_pdf_path)
+
+@pytest.mark.parametrize('input_pdf_path, data_dict', [(NEW_PDF, {'Country Combo Box': 'Mars'}), (EX_PDF, {'Kontrollkästchen1': '7'})])
+@pytest.mark.parametrize('engine', fillpdfs.ENGINES)
+def test_write_fillable_pdf_engines_reject_unknown_options(input_pdf_path, data_dict, engine):
+  with pytest.raises(KeyError):
+    fillpdfs.write_fillable_pdf(input_pdf_path, None, data_dict, engine=engine)
+
+def test_flatten_pdf_pymupdf_makes_fields_read_only():
+  import fitz
+  doc = fitz.open(stream=fillpdfs.flatten_pdf(NEW_PDF, None, engine='pymupdf'), filetype='pdf')
+  assert all(widget.field_flags & fitz.PDF_FIELD_IS_READ_ONLY for page in doc for widget in page.widgets())
+  assert fillpdfs.get_form_fields(doc.tobytes()) == fillpdfs.get_form_fields(NEW_PDF)
+
+@pytest.mark.parametrize('output', ['path', None])
+def test_flatten_pdf_as_images_renders_and_appends_in_chunks(tmp_path, monkeypatch, output):
+  from PIL import Image
+  calls = []
+  def convert(source, dpi, first_page, last_page, thread_count):
+    calls.append((source, dpi, first_page, last_page))
+    # page n is 300 + n points wide and 400 points high
+    return [Image.new('L', ((300 + page) * dpi // 72, 400 * dpi // 72), page * 9)
+            for page in range(first_page, last_page + 1)]
+  monkeypatch.setattr(fillpdfs.pdf2image, 'pdfinfo_from_path', lambda source: {'Pages': 25})
+  monkeypatch.setattr(fillpdfs.pdf2image, 'convert_from_path', convert)
+  output_pdf_path = str(tmp_path / 'flat.pdf') if output == 'path' else None
+  flat = fillpdfs.flatten_pdf(NEW_PDF, output_pdf_path, as_images=True, dpi=144, chunk_size=10)
+  assert [call[1:] for call in calls] == [(144, 1, 10), (144, 11, 20), (144, 21, 25)]
+  pdf = pdfrw.PdfReader(output_pdf_path) if output == 'path' else pdfrw.PdfReader(fdata=flat)
+  assert [[float(value) for value in page.MediaBox] for page in pdf.pages] == \
+    [[0, 0, 300 + page, 400] for page in range(1, 26)]
+
+def test_get_form_schema_describes_fields():
+  schema = fillpdfs.get_form_schema(EX_PDF, cache=False)
+  radio = schema['Kontrollkästchen1']
+  assert radio.kind == 'radio' and radio.export_states == ['1', '2'] and radio.page == 1
+  assert [page for page, rect in radio.widgets] == [1, 1] and radio.rect == radio.widgets[0][1]
+  schema = fillpdfs.get_form_schema(NEW_PDF, cache=False)
+  assert schema['Country Combo Box'].options[:2] == ['Austria', 'Belgium']
+  assert schema['Given Name Text Box'].max_length == 40
+
+def test_get_form_schema_is_served_from_sidecar_until_pdf_changes(tmp_path):
+  import shutil
+  template = str(tmp_path / 'blank.pdf')
+  shutil.copyfile(NEW_PDF, template)
+  schema = fillpdfs.get_form_schema(template)
+  assert os.path.exists(template + '.schema.json')
+  reports = []
+  with fillpdfs.metrics_sink(reports.append):
+    assert fillpdfs.get_form_schema(template) == schema
+  assert 'parse' not in reports[0].phases
+  fillpdfs.write_fillable_pdf(NEW_PDF, template, {}, flatten=True)
+  assert fillpdfs.get_form_schema(template)['Gender List Box'].flags != schema['Gender List Box'].flags
+
+def test_validate_records_reports_every_error():
+  records = [
+    {'Given Name Text Box': 'x' * 41, 'Country Combo Box': 'Mars', 'Nickname': 'Jo'},
+    {'Language 1 Check Box': 'Maybe', 'Gender List Box': 'Man', 'Language 2 Check Box': 'Off'},
+    {'Given Name Text Box': 'John', 'Country Combo Box': '', 'Height Formatted Field': 180},
+  ]
+  errors = fillpdfs.validate_records(fillpdfs.get_form_schema(NEW_PDF, cache=False), records)
+  assert [(error.index, error.field) for error in errors] == [
+    (0, 'Given Name Text Box'), (0, 'Country Combo Box'), (0, 'Nickname'), (1, 'Language 1 Check Box')]
+  validator = fillpdfs.FormValidator(fillpdfs.FormTemplate(EX_PDF))
+  assert validator.validate([{'Kontrollkästchen1': '7'}, {'Kontrollkästchen1': '2'}])[0].index == 0
+
+def test_write_fillable_pdf_batch_validates_before_writing(tmp_path):
+  records = [{'Text2': 'a'}, {'Kontrollkästchen1': '7'}]
+  with pytest.raises(fillpdfs.RecordValidationError) as raised:
+    list(fillpdfs.write_fillable_pdf_batch(fillpdfs.FormTemplate(EX_PDF), records, str(tmp_path / '{index}.pdf'),
+                                           workers=1, validate=True))
+  assert [error.index for error in raised.value.errors] == [1]
+  assert os.listdir(tmp_path) == []
+
+def test_validating_a_template_path_writes_no_schema_cache(tmp_path):
+  import shutil
+  template = str(tmp_path / 'ex.pdf')
+  shutil.copyfile(EX_PDF, template)
+  fillpdfs.FormValidator(template).check([{'Text2': 'a'}])
+  list(fillpdfs.write_fillable_pdf_batch(template, [{'Text2': 'a'}], str(tmp_path / 'out.pdf'), workers=1, validate=True))
+  fillpdfs.write_fillable_pdf_merged(template, [{'Text2': 'a'}], str(tmp_path / 'merged.pdf'), validate=True)
+  assert sorted(os.listdir(tmp_path)) == ['ex.pdf', 'merged.pdf', 'out.pdf']
+
+def test_get_form_fields_batch_reports_errors_per_pdf(tmp_path):
+  broken = tmp_path / 'broken.pdf'
+  broken.write_bytes(b'not a pdf')
+  results = list(fillpdfs.get_form_fields_batch([NEW_PDF, str(broken), EX_PDF], workers=2))
+  assert [result.index for result in results] == [0, 1, 2]
+  assert results[0].fields == fillpdfs.get_form_fields(NEW_PDF) and results[0].error is None
+  assert results[1].fields is None and results[1].error is not None
+
+def test_extractfillpdf_streams_directories_and_globs(tmp_path):
+  import json
+  import shutil
+  from fillpdf.extractfillpdf import extractfillpdf
+  (tmp_path / 'in' / 'sub').mkdir(parents=True)
+  shutil.copyfile(NEW_PDF, tmp_path / 'in' / 'a.pdf')
+  shutil.copyfile(NEW_PDF, tmp_path / 'in' / 'sub' / 'b.pdf')
+  assert extractfillpdf(str(tmp_path / 'in'), str(tmp_path / 'out.jsonl'), workers=2) == 2
+  rows = [json.loads(line) for line in (tmp_path / 'out.jsonl').read_text().splitlines()]
+  assert sorted(os.path.basename(row['path']) for row in rows) == ['a.pdf', 'b.pdf']
+  assert rows[0]['fields'] == fillpdfs.get_form_fields(NEW_PDF)
+  assert extractfillpdf([str(tmp_path / 'in' / '*.pdf')], str(tmp_path / 'out.csv')) == 1
+  header, row = (tmp_path / 'out.csv').read_text().splitlines()
+  assert header.startswith('path,error,Given Name Text Box') and row.startswith(str(tmp_path / 'in' / 'a.pdf'))
+
+def test_extractfillpdf_uses_the_index_for_a_single_pdf(tmp_path):
+  import json
+  import shutil
+  from fillpdf.extractfillpdf import extractfillpdf, main
+  shutil.copyfile(NEW_PDF, tmp_path / 'a.pdf')
+  index_file = str(tmp_path / 'index.sqlite')
+  assert extractfillpdf(str(tmp_path / 'a.pdf'), str(tmp_path / 'a.jsonl'), index_file=index_file) == 1
+  with fillpdfs.ExtractionIndex(index_file) as index:
+    assert index.get(str(tmp_path / 'a.pdf')) == fillpdfs.get_form_fields(NEW_PDF)
+  main([str(tmp_path / 'a.pdf'), '--index', index_file, '-o', str(tmp_path / 'b.jsonl')])
+  row = json.loads((tmp_path / 'b.jsonl').read_text())
+  assert row['path'] == str(tmp_path / 'a.pdf') and row['fields'] == fillpdfs.get_form_fields(NEW_PDF)
+  with pytest.raises(SystemExit):
+    main([str(tmp_path / 'a.pdf'), '--index', index_file])
+
+def test_extraction_index_parses_only_new_and_changed_pdfs(tmp_path):
+  import shutil
+  shutil.copyfile(NEW_PDF, tmp_path / 'a.pdf')
+  shutil.copyfile(EX_PDF, tmp_path / 'b.pdf')
+  paths = [str(tmp_path / 'a.pdf'), str(tmp_path / 'b.pdf')]
+  with fillpdfs.ExtractionIndex(str(tmp_path / 'index.sqlite')) as index:
+    assert index.update(paths) == fillpdfs.IndexUpdate(parsed=2, unchanged=0, copied=0, failed=0)
+  fillpdfs.write_fillable_pdf(NEW_PDF, str(tmp_path / 'b.pdf'), {'Country Combo Box': 'Germany'})
+  shutil.copyfile(NEW_PDF, tmp_path / 'c.pdf')
+  with fillpdfs.ExtractionIndex(str(tmp_path / 'index.sqlite')) as index:
+    assert index.update(paths + [str(tmp_path / 'c.pdf')]) == fillpdfs.IndexUpdate(parsed=1, unchanged=1, copied=1, failed=0)
+    assert index.get(str(tmp_path / 'a.pdf')) == fillpdfs.get_form_fields(NEW_PDF)
+    assert list(index.find('Country Combo Box', 'Germany')) == [str(tmp_path / 'b.pdf')]
+    assert len(list(index.values('Gender List Box'))) == 3
+
+def test_extraction_index_yields_a_repeated_path_at_each_position(tmp_path):
+  import shutil
+  shutil.copyfile(NEW_PDF, tmp_path / 'a.pdf')
+  shutil.copyfile(EX_PDF, tmp_path / 'b.pdf')
+  a, b = str(tmp_path / 'a.pdf'), str(tmp_path / 'b.pdf')
+  with fillpdfs.ExtractionIndex(str(tmp_path / 'index.sqlite')) as index:
+    for _ in range(2):
+      results = sorted(index.extract([a, b, a]), key=lambda result: result.index)
+      assert [(result.index, result.input_pdf_path) for result in results] == [(0, a), (1, b), (2, a)]
+      assert results[0].fields == results[2].fields == fillpdfs.get_form_fields(NEW_PDF)
+    assert index.update([a, a]) == fillpdfs.IndexUpdate(parsed=0, unchanged=2, copied=0, failed=0)
+
+@pytest.mark.parametrize('value', ['Łukasz Żółw', '山田太郎', 'Müller'])
+def test_write_fillable_pdf_leaves_values_the_font_cannot_show_to_the_viewer(value):
+  # Text2's Verdana has a MacRoman based encoding, only ASCII is encoded alike
+  filled = fillpdfs.write_fillable_pdf(EX_PDF, None, {'Text2': value})
+  pdf = pdfrw.PdfReader(fdata=filled)
+  widget = next(annot for annot in pdf.pages[0].Annots if annot.T == '(Text2)')
+  assert widget.AP is None
+  assert pdf.Root.AcroForm.NeedAppearances == 'true'
+  assert fillpdfs.get_form_fields(filled)['Text2'] == value
+
+def test_write_fillable_pdf_builds_appearances_for_winansi_values_only():
+  # new.pdf's /F3 is a WinAnsiEncoding font
+  for value, built in [('Müller €', True), ('Łukasz', False)]:
+    pdf = pdfrw.PdfReader(fdata=fillpdfs.write_fillable_pdf(NEW_PDF, None, {'Given Name Text Box': value}))
+    widget = next(annot for annot in pdf.pages[0].Annots if annot.T == '(Given Name Text Box)')
+    assert (widget.AP is not None) == built
+
+def test_extractfillpdf_raises_for_a_missing_pdf(tmp_path):
+  from fillpdf.extractfillpdf import extractfillpdf
+  with pytest.raises(Exception):
+    extractfillpdf(str(tmp_path / 'typo.pdf'), str(tmp_path / 'typo.json'))
+  assert not (tmp_path / 'typo.json').exists()
+
+def test_read_records_reports_malformed_lines_and_reads_csv_with_bom(tmp_path):
+  from fillpdf.insertfillpdf import read_records
+  (tmp_path / 'in.jsonl').write_text('{"Name": "a"}\n\n{"Name": \n{"Name": "b"}\n')
+  first, bad, last = read_records(str(tmp_path / 'in.jsonl'))
+  assert first == {'Name': 'a'} and last == {'Name': 'b'}
+  assert isinstance(bad, ValueError) and 'line 3' in str(bad)
+  (tmp_path / 'in.csv').write_bytes('Name,City\nJohn,Köln\n'.encode('utf-8-sig'))
+  assert list(read_records(str(tmp_path / 'in.csv'))) == [{'Name': 'John', 'City': 'Köln'}]
+
+def test_insertfillpdf_records_continues_after_a_malformed_line(tmp_path, capsys):
+  from fillpdf.insertfillpdf import insertfillpdf_records
+  (tmp_path / 'in.jsonl').write_text('{"Given Name Text Box": "John"}\nnot json\n{"Given Name Text Box": "Jane"}\n')
+  pattern = str(tmp_path / 'out_{index}.pdf')
+  assert insertfillpdf_records(NEW_PDF, str(tmp_path / 'in.jsonl'), pattern) == 2
+  assert 'Record 1 failed' in capsys.readouterr().out
+  assert not (tmp_path / 'out_1.pdf').exists()
+  assert fillpdfs.get_form_fields(str(tmp_path / 'out_2.pdf'))['Given Name Text Box'] == 'Jane'
+
+@pytest.mark.parametrize('records_format, text', [
+  ('csv', 'Given Name Text Box\nJohn\nJane\n'),
+  ('jsonl', '{"Given Name Text Box": "John"}\n{"Given Name Text Box": "Jane"}\n'),
+])
+def test_insertfillpdf_cli_writes_one_pdf_per_record_from_stdin(tmp_path, monkeypatch, records_format, text):
+  from fillpdf.insertfillpdf import main
+  monkeypatch.setattr('sys.stdin', io.StringIO(text))
+  main([NEW_PDF, '-r', '-', '--format', records_format, '-o', str(tmp_path / '{record[Given Name Text Box]}.pdf')])
+  for name in ['John', 'Jane']:
+    assert fillpdfs.get_form_fields(str(tmp_path / (name + '.pdf')))['Given Name Text Box'] == name
+
+def test_insertfillpdf_cli_names_records_by_index_by_default(tmp_path):
+  import shutil
+  from fillpdf.insertfillpdf import main
+  shutil.copyfile(NEW_PDF, tmp_path / 'form.pdf')
+  (tmp_path / 'in.csv').write_text('Given Name Text Box\nJohn\n')
+  main([str(tmp_path / 'form.pdf'), '-r', str(tmp_path / 'in.csv')])
+  assert fillpdfs.get_form_fields(str(tmp_path / 'form_0.pdf'))['Given Name Text Box'] == 'John'
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from fillpdf.utils.field_format import make_read_only
+from fillpdf.utils.field_format import is_text_field_multiline, make_read_only
 
 # Given no test framework is currently defined, I just used some standard python
 
@@ -13,3 +13,9 @@ def test_make_read_only_with_empty_field_format(fixture: Optional[str] = None):
   read_only_field_format = make_read_only(fixture)
   binary_field_format = "{0:b}".format(int(read_only_field_format))
   assert binary_field_format.endswith("1")
+
+def test_is_text_field_multiline():
+  assert is_text_field_multiline(4096)
+  assert is_text_field_multiline(4097)
+  assert not is_text_field_multiline(0)
+  assert not is_text_field_multiline(8192)